@@ -1,33 +1,34 @@
 from fastapi import APIRouter, HTTPException, Depends, status
 from fastapi.security import OAuth2PasswordBearer
-from google.oauth2 import id_token
-from google.auth.transport import requests
 from app.core.config import settings
+from app.core.google_certs import google_certs
 from app.core.security import create_access_token, get_current_user
-from app.db.mongodb import get_collection
-from app.models.user import User, UserCreate
+from app.models.user import User, UserCreate, AuthUser, AuthResponse, TokenResponse
+from app.repositories import users as users_repo, refresh_tokens as refresh_tokens_repo
 from datetime import datetime, timedelta
 from typing import Optional
 from pydantic import BaseModel
 import logging
-import asyncio
-from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# ✅ OPTIMIZATION: Cache Google's public keys to avoid repeated fetches
-@lru_cache(maxsize=1)
-def get_cached_request():
-    """Cache the Request object used for token verification"""
-    return requests.Request()
-
 class GoogleAuthRequest(BaseModel):
     token: str
 
-@router.post("/google", response_model=dict)
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+def issue_access_token(user_id: str, email: Optional[str]) -> str:
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return create_access_token(
+        data={"sub": user_id, "email": email},
+        expires_delta=access_token_expires
+    )
+
+@router.post("/google", response_model=AuthResponse)
 async def google_auth(auth_request: GoogleAuthRequest):
     """
     Authenticate user with Google OAuth token (OPTIMIZED FOR SPEED)
@@ -35,19 +36,12 @@ async def google_auth(auth_request: GoogleAuthRequest):
     try:
         logger.info(f"Attempting to verify Google token (length: {len(auth_request.token)})")
         
-        # ✅ OPTIMIZATION 1: Use cached Request object to avoid creating new ones
-        cached_request = get_cached_request()
-        
-        # ✅ OPTIMIZATION 2: Run token verification in thread pool (it's blocking I/O)
-        loop = asyncio.get_event_loop()
-        idinfo = await loop.run_in_executor(
-            None,
-            lambda: id_token.verify_oauth2_token(
-                auth_request.token,
-                cached_request,
-                settings.GOOGLE_CLIENT_ID,
-                clock_skew_in_seconds=10
-            )
+        # ✅ OPTIMIZATION 1: Verify locally against Google's certificates, cached for
+        # their max-age and refreshed in the background (no outbound call per login)
+        idinfo = await google_certs.verify(
+            auth_request.token,
+            settings.GOOGLE_CLIENT_ID,
+            clock_skew_in_seconds=10
         )
         
         logger.info(f"Token verified successfully for user: {idinfo.get('email')}")
@@ -58,46 +52,28 @@ async def google_auth(auth_request: GoogleAuthRequest):
         name = idinfo.get('name')
         picture = idinfo.get('picture')
         
-        # ✅ OPTIMIZATION 3: Use upsert to combine find + insert/update in one operation
-        users_collection = await get_collection("users")
-        
-        # Prepare user data
-        current_time = datetime.utcnow()
-        user_data = {
-            "user_id": user_id,
-            "name": name,
-            "email": email,
-            "picture": picture,
-            "last_login": current_time
-        }
+        # ✅ OPTIMIZATION 2: Use upsert to combine find + insert/update in one operation
+        created = await users_repo.upsert_google_user(user_id, name, email, picture)
         
-        # Upsert: update if exists, insert if not (single DB operation)
-        result = await users_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$set": user_data,
-                "$setOnInsert": {"created_at": current_time}
-            },
-            upsert=True
-        )
-        
-        if result.upserted_id:
+        if created:
             logger.info(f"Created new user: {email}")
         else:
             logger.info(f"Updated existing user: {email}")
         
-        # ✅ OPTIMIZATION 4: Create token immediately (don't wait for anything else)
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user_id, "email": email},
-            expires_delta=access_token_expires
-        )
+        # ✅ OPTIMIZATION 3: Create token immediately (don't wait for anything else)
+        access_token = issue_access_token(user_id, email)
+        
+        # ✅ OPTIMIZATION 4: A refresh token lets the client renew the access token
+        # through /refresh instead of repeating this login every half hour
+        refresh_token = await refresh_tokens_repo.issue(user_id, email)
         
         logger.info(f"Access token created successfully for: {email}")
         
         return {
             "access_token": access_token,
             "token_type": "bearer",
+            "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+            "refresh_token": refresh_token,
             "user": {
                 "user_id": user_id,
                 "name": name,
@@ -105,7 +81,7 @@ async def google_auth(auth_request: GoogleAuthRequest):
                 "picture": picture
             }
         }
-        
+    
     except ValueError as e:
         # Invalid token
         logger.error(f"Token verification failed (ValueError): {str(e)}")
@@ -120,13 +96,37 @@ async def google_auth(auth_request: GoogleAuthRequest):
             detail=f"Authentication failed: {str(e)}"
         )
 
-@router.get("/me")
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh_access_token(refresh_request: RefreshRequest):
+    """
+    ✅ OPTIMIZED: Exchange a refresh token for a new access token
+    - One lookup by the token's hash; no Google verification or user write
+    - The refresh token rotates: the response carries its replacement, and
+      presenting a used token again (after a few seconds' grace for concurrent tabs)
+      revokes every token issued from the same login
+    """
+    rotated = await refresh_tokens_repo.rotate(refresh_request.refresh_token)
+    
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+    
+    current, refresh_token = rotated
+    return {
+        "access_token": issue_access_token(current["user_id"], current.get("email")),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token
+    }
+
+@router.get("/me", response_model=AuthUser)
 async def get_current_user_info(user: dict = Depends(get_current_user)):
     """
     Get current authenticated user
     """
-    users_collection = await get_collection("users")
-    user_data = await users_collection.find_one({"user_id": user["id"]})
+    user_data = await users_repo.get_profile(user["id"])
     
     if not user_data:
         raise HTTPException(
@@ -135,8 +135,8 @@ async def get_current_user_info(user: dict = Depends(get_current_user)):
         )
     
     return {
-        "user_id": user_data["user_id"],
-        "name": user_data["name"],
-        "email": user_data["email"],
-        "picture": user_data.get("picture")
+        "user_id": user_data.user_id,
+        "name": user_data.name,
+        "email": user_data.email,
+        "picture": user_data.picture
     }
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, Query
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.models.dashboard import Dashboard
+from app.models.user import UserStats
+from app.repositories import goals as goals_repo, sessions as sessions_repo, stats as stats_repo, users as users_repo
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+async def _user_stats(user_id: str) -> UserStats:
+    totals = await stats_repo.get_user_stats(user_id)
+    return UserStats(
+        total_sessions=totals["session_count"],
+        total_reps=totals["reps"],
+        total_duration=totals["duration"]
+    )
+
+async def _recent_sessions(user_id: str, limit: int):
+    sessions, _ = await sessions_repo.session_history(user_id, limit, None)
+    return sessions
+
+@router.get("", response_model=Dashboard)
+async def get_dashboard(
+    history_limit: int = Query(5, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    ✅ OPTIMIZED: Profile, stats, recent history, today's goals and goal summary in one request
+    - Authenticates once and runs the section queries concurrently
+    - A section that fails or exceeds DASHBOARD_SECTION_TIMEOUT_SECONDS comes back
+      null (named in errors) instead of failing the whole page
+    """
+    user_id = current_user["id"]
+    today = date.today().isoformat()
+    sections = {
+        "profile": users_repo.get_profile(user_id),
+        "stats": _user_stats(user_id),
+        "recent_sessions": _recent_sessions(user_id, history_limit),
+        "today_goals": goals_repo.find_goals(user_id, start_date=today, end_date=today, limit=100),
+        "goal_stats": goals_repo.goal_stats(user_id)
+    }
+    
+    results = await asyncio.gather(
+        *(asyncio.wait_for(query, settings.DASHBOARD_SECTION_TIMEOUT_SECONDS) for query in sections.values()),
+        return_exceptions=True
+    )
+    
+    dashboard = Dashboard()
+    for name, result in zip(sections, results):
+        if isinstance(result, Exception):
+            logger.warning(f"⚠️ Dashboard section {name} failed: {type(result).__name__}: {result}")
+            dashboard.errors.append(name)
+        else:
+            setattr(dashboard, name, result)
+    
+    return dashboard
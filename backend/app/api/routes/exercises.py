@@ -1,27 +1,33 @@
-from fastapi import APIRouter, HTTPException, status
-from app.db.mongodb import get_collection
-from app.models.exercise import Exercise, ExerciseCreate
-from typing import List
+from fastapi import APIRouter, HTTPException, Header, Response, status
+from app.models.common import MessageResponse
+from app.models.exercise import Exercise, ExerciseCreate, ExerciseResponse
+from app.repositories import exercises as exercises_repo
+from app.utils.etag import conditional
+from typing import List, Optional
 
 router = APIRouter()
 
-@router.get("/", response_model=List[dict])
-async def get_all_exercises():
-    """Get all available exercises"""
-    exercises_collection = await get_collection("exercises")
-    cursor = exercises_collection.find({})
-    exercises = await cursor.to_list(length=100)
-    
-    for exercise in exercises:
-        exercise['_id'] = str(exercise['_id'])
-    
-    return exercises
+@router.get("/", response_model=List[ExerciseResponse])
+async def get_all_exercises(
+    response: Response,
+    type: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    ✅ OPTIMIZED: Get all available exercises, optionally of one type
+    - Served from the in-memory catalog, no database access
+    - Answers If-None-Match with 304 while the catalog is unchanged
+    """
+    catalog = await exercises_repo.get_catalog()
+    exercises = catalog.exercises if type is None else catalog.by_type.get(type, ())
+    # Same for every client, so shared caches may store it too
+    return conditional(response, if_none_match, catalog.etag, "public, no-cache") or exercises
 
-@router.get("/{exercise_id}")
+@router.get("/{exercise_id}", response_model=ExerciseResponse)
 async def get_exercise(exercise_id: str):
     """Get specific exercise by ID"""
-    exercises_collection = await get_collection("exercises")
-    exercise = await exercises_collection.find_one({"exercise_id": exercise_id})
+    catalog = await exercises_repo.get_catalog()
+    exercise = catalog.by_id.get(exercise_id)
     
     if not exercise:
         raise HTTPException(
@@ -29,35 +35,26 @@ async def get_exercise(exercise_id: str):
             detail="Exercise not found"
         )
     
-    exercise['_id'] = str(exercise['_id'])
     return exercise
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=ExerciseResponse, status_code=status.HTTP_201_CREATED)
 async def create_exercise(exercise: ExerciseCreate):
     """Create a new exercise"""
-    exercises_collection = await get_collection("exercises")
-    
-    # Check if exercise already exists
-    existing = await exercises_collection.find_one({"exercise_id": exercise.exercise_id})
-    if existing:
+    # Check if exercise already exists (the unique index still catches one
+    # created by another worker since this catalog was loaded)
+    catalog = await exercises_repo.get_catalog()
+    if exercise.exercise_id in catalog.by_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Exercise already exists"
         )
     
-    exercise_dict = exercise.model_dump()
-    result = await exercises_collection.insert_one(exercise_dict)
-    exercise_dict['_id'] = str(result.inserted_id)
-    
-    return exercise_dict
+    return await exercises_repo.insert_exercise(exercise.model_dump())
 
-@router.delete("/{exercise_id}")
+@router.delete("/{exercise_id}", response_model=MessageResponse)
 async def delete_exercise(exercise_id: str):
     """Delete an exercise"""
-    exercises_collection = await get_collection("exercises")
-    result = await exercises_collection.delete_one({"exercise_id": exercise_id})
-    
-    if result.deleted_count == 0:
+    if not await exercises_repo.delete_exercise(exercise_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Exercise not found"
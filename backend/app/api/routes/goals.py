@@ -1,253 +1,186 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Optional, List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Literal
 from datetime import datetime, date, timedelta
 from bson import ObjectId
-from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 
+from app.models.common import MessageResponse
 from app.models.goal import (
-    GoalCreate, GoalUpdate, GoalResponse, BulkGoalCreate, ExerciseGoal
+    GoalCreate, GoalUpdate, GoalResponse, GoalStats, BulkGoalCreate, ExerciseGoal
 )
+from app.core.config import settings
+from app.core.rate_limit import rate_limit
 from app.core.security import get_current_user
-from app.db.mongodb import get_database
+from app.repositories import goals as goals_repo
+from app.utils.etag import conditional, etag_matches
+from app.utils.export import export_rows, EXPORT_MEDIA_TYPES
 
 router = APIRouter()
 
-def goal_to_response(goal: dict) -> GoalResponse:
-    """Convert MongoDB goal document to response schema"""
-    progress = int((goal["completed_count"] / goal["target_count"]) * 100) if goal["target_count"] > 0 else 0
-    return GoalResponse(
-        id=str(goal["_id"]),
-        user_id=goal["user_id"],
-        exercise_type=goal["exercise_type"],
-        target_count=goal["target_count"],
-        date=goal["date"].isoformat() if isinstance(goal["date"], date) else goal["date"],
-        completed_count=goal["completed_count"],
-        status=goal["status"],
-        progress_percentage=progress,
-        created_at=goal["created_at"].isoformat() if isinstance(goal["created_at"], datetime) else goal["created_at"],
-        updated_at=goal["updated_at"].isoformat() if isinstance(goal["updated_at"], datetime) else goal["updated_at"]
-    )
-
 @router.post("/goals", response_model=GoalResponse, status_code=status.HTTP_201_CREATED)
 async def create_goal(
     goal: GoalCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limit())
 ):
     """Create a new exercise goal"""
-    db = await get_database()
-    if db is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Database connection not available"
-        )
-    
-    goals_collection = db["goals"]
-    
-    # Check if goal already exists for this date and exercise
-    existing = await goals_collection.find_one({
-        "user_id": current_user["id"],
-        "exercise_type": goal.exercise_type,
-        "date": goal.date.isoformat() if isinstance(goal.date, date) else goal.date
-    })
-    
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Goal already exists for this exercise and date"
-        )
-    
     goal_dict = goal.model_dump()
+    goal_dict["_id"] = ObjectId()
     goal_dict["user_id"] = current_user["id"]
     goal_dict["completed_count"] = 0
     goal_dict["status"] = "pending"
     goal_dict["created_at"] = datetime.utcnow()
     goal_dict["updated_at"] = datetime.utcnow()
     
-    # Convert date to ISO string for consistency
-    if isinstance(goal_dict["date"], date):
-        goal_dict["date"] = goal_dict["date"].isoformat()
+    # Store (and key the month cache by) the canonical YYYY-MM-DD form
+    try:
+        goal_dict["date"] = goals_repo.normalize_day(goal_dict["date"])
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date must be in YYYY-MM-DD format"
+        )
     
-    result = await goals_collection.insert_one(goal_dict)
-    goal_dict["_id"] = result.inserted_id
+    # ✅ OPTIMIZATION: Single insert - the unique (user_id, exercise_type, date)
+    # index rejects duplicates, so no separate existence check is needed
+    try:
+        await goals_repo.insert_goal(goal_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Goal already exists for this exercise and date"
+        )
     
-    return goal_to_response(goal_dict)
+    return GoalResponse.model_validate(goal_dict)
 
 @router.post("/goals/bulk", response_model=List[GoalResponse], status_code=status.HTTP_201_CREATED)
 async def create_goals_bulk(
     bulk_goals: BulkGoalCreate,
-    current_user: dict = Depends(get_current_user)
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user: dict = Depends(rate_limit(cost=5))
 ):
     """
-    ✅ OPTIMIZED: Sync goals for the current month using bulk operations
-    - Uses bulk_write for all insert/update operations
-    - Single delete_many for cleanup
-    - Reduced from N+1 queries to 3 total queries
+    ✅ OPTIMIZED: Sync goals for one month
+    - Reads the month once and diffs it in memory against the submitted goals
+    - Only new goals, changed targets and removed goals are written, in one unordered bulk_write;
+      an unchanged calendar costs one read and no writes
+    - Send the month's ETag (from GET /goals for the month, or the previous sync) as If-Match
+      to get 412 instead of overwriting changes made on another device
+    - While the database is offline, a month read within GOAL_CACHE_TTL_SECONDS can still be
+      synced: the diff is taken against the cached month and the writes are journaled
     """
-    db = await get_database()
-    if db is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Database connection not available"
-        )
-    
-    goals_collection = db["goals"]
+    goal_dates = []
+    for goal in bulk_goals.goals:
+        try:
+            goal_dates.append(goals_repo.normalize_day(goal.date))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Goal date {goal.date} must be in YYYY-MM-DD format"
+            )
     
     # Get the month from the request, or infer from first goal
     current_month = bulk_goals.month
-    if not current_month and bulk_goals.goals:
-        first_goal_date = bulk_goals.goals[0].date
-        if isinstance(first_goal_date, date):
-            current_month = first_goal_date.strftime("%Y-%m")
-        else:
-            current_month = first_goal_date[:7]  # "YYYY-MM"
+    if not current_month and goal_dates:
+        current_month = goal_dates[0][:7]  # "YYYY-MM"
     
-    # ✅ OPTIMIZATION 1: Prepare all upsert operations at once
-    bulk_operations = []
-    goals_to_keep = []
-    current_time = datetime.utcnow()
+    if not current_month:
+        return []
     
-    for goal in bulk_goals.goals:
-        goal_date = goal.date.isoformat() if isinstance(goal.date, date) else goal.date
-        goals_to_keep.append((goal_date, goal.exercise_type))
-        
-        # Prepare upsert operation (update if exists, insert if not)
-        bulk_operations.append(
-            UpdateOne(
-                {
-                    "user_id": current_user["id"],
-                    "exercise_type": goal.exercise_type,
-                    "date": goal_date
-                },
-                {
-                    "$set": {
-                        "target_count": goal.target_count,
-                        "updated_at": current_time
-                    },
-                    "$setOnInsert": {
-                        "user_id": current_user["id"],
-                        "exercise_type": goal.exercise_type,
-                        "date": goal_date,
-                        "completed_count": 0,
-                        "status": "pending",
-                        "created_at": current_time
-                    }
-                },
-                upsert=True
-            )
+    try:
+        month_start, month_end = goals_repo.month_bounds(current_month)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="month must be in YYYY-MM format"
         )
+    current_month = month_start[:7]  # strptime also takes "2026-1"
+    
+    desired = {}
+    for goal, goal_date in zip(bulk_goals.goals, goal_dates):
+        if not month_start <= goal_date <= month_end:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Goal date {goal_date} is outside {current_month}"
+            )
+        desired[(goal_date, goal.exercise_type)] = goal.target_count
     
-    # ✅ OPTIMIZATION 2: Execute all operations in a single bulk_write
-    if bulk_operations:
-        await goals_collection.bulk_write(bulk_operations, ordered=False)
-        print(f"[BULK SYNC] Processed {len(bulk_operations)} goals in single operation")
-    
-    # ✅ OPTIMIZATION 3: Delete unwanted goals with single delete_many
-    if current_month and goals_to_keep:
-        month_start = f"{current_month}-01"
-        month_end = f"{current_month}-31"
-        
-        # Build a query to delete goals NOT in the goals_to_keep list
-        # MongoDB doesn't have a direct "NOT IN" for tuples, so we use $or with $ne
-        delete_query = {
-            "user_id": current_user["id"],
-            "date": {"$gte": month_start, "$lte": month_end}
-        }
-        
-        # Only delete if the (date, exercise_type) combo is not in goals_to_keep
-        # We'll use $nor to exclude our kept goals
-        exclude_conditions = [
-            {"date": goal_date, "exercise_type": exercise_type}
-            for goal_date, exercise_type in goals_to_keep
-        ]
-        
-        if exclude_conditions:
-            delete_query["$nor"] = exclude_conditions
-        
-        delete_result = await goals_collection.delete_many(delete_query)
-        print(f"[BULK SYNC] Deleted {delete_result.deleted_count} goals not in the submitted list")
+    # ✅ OPTIMIZATION 1: One read of the whole month (the cached month while the database is offline)
+    existing = await goals_repo.month_for_sync(current_user["id"], current_month)
     
-    # ✅ OPTIMIZATION 4: Fetch all saved goals in a single query
-    if current_month:
-        month_start = f"{current_month}-01"
-        month_end = f"{current_month}-31"
-        
-        saved_goals = await goals_collection.find({
-            "user_id": current_user["id"],
-            "date": {"$gte": month_start, "$lte": month_end}
-        }).sort("date", 1).to_list(length=100)
-        
-        return [goal_to_response(goal) for goal in saved_goals]
+    if if_match:
+        current_version = goals_repo.goals_version([GoalResponse.model_validate(goal) for goal in existing])
+        if not etag_matches(if_match, current_version):
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Goals for this month changed since they were loaded"
+            )
     
-    # Fallback: fetch the specific goals we just created
-    goal_keys = [(goal_date, exercise_type) for goal_date, exercise_type in goals_to_keep]
-    saved_goals = await goals_collection.find({
-        "user_id": current_user["id"],
-        "$or": [
-            {"date": goal_date, "exercise_type": exercise_type}
-            for goal_date, exercise_type in goal_keys
-        ]
-    }).to_list(length=100)
+    # ✅ OPTIMIZATION 2: Write only the difference (an empty submission never clears the month)
+    saved = await goals_repo.apply_month_diff(
+        current_user["id"], current_month, existing, desired, datetime.utcnow(), delete_missing=bool(desired)
+    )
     
-    return [goal_to_response(goal) for goal in saved_goals]
+    goals = [GoalResponse.model_validate(goal) for goal in saved]
+    response.headers["ETag"] = goals_repo.goals_version(goals)
+    return goals
 
 @router.get("/goals", response_model=List[GoalResponse])
 async def get_goals(
+    response: Response,
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
     exercise_type: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get goals with optional filters"""
-    db = await get_database()
-    if db is None:
+    """
+    Get goals with optional filters
+    The ETag of a whole month's goals is the version token to send as If-Match to /goals/bulk;
+    sent back as If-None-Match, it gets 304 while the goals are unchanged
+    """
+    try:
+        goals = await goals_repo.find_goals(
+            current_user["id"],
+            start_date=start_date,
+            end_date=end_date,
+            exercise_type=exercise_type,
+            status=status
+        )
+    except ValueError:
         raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Database connection not available"
+            status_code=400,
+            detail="start_date and end_date must be in YYYY-MM-DD format"
         )
-    
-    goals_collection = db["goals"]
-    
-    query = {"user_id": current_user["id"]}
-    
-    if start_date and end_date:
-        query["date"] = {"$gte": start_date, "$lte": end_date}
-    elif start_date:
-        query["date"] = {"$gte": start_date}
-    elif end_date:
-        query["date"] = {"$lte": end_date}
-    
-    if exercise_type:
-        query["exercise_type"] = exercise_type
-    
-    if status:
-        query["status"] = status
-    
-    cursor = goals_collection.find(query).sort("date", 1)
-    goals = await cursor.to_list(length=1000)
-    
-    return [goal_to_response(goal) for goal in goals]
+    return conditional(response, if_none_match, goals_repo.goals_version(goals)) or goals
 
 @router.get("/goals/today", response_model=List[GoalResponse])
 async def get_today_goals(current_user: dict = Depends(get_current_user)):
     """Get goals for today"""
-    db = await get_database()
-    if db is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Database connection not available"
-        )
-    
-    goals_collection = db["goals"]
     today = date.today().isoformat()
-    
-    cursor = goals_collection.find({
-        "user_id": current_user["id"],
-        "date": today
-    })
-    goals = await cursor.to_list(length=100)
-    
-    return [goal_to_response(goal) for goal in goals]
+    return await goals_repo.find_goals(current_user["id"], start_date=today, end_date=today, limit=100)
+
+@router.get("/goals/export", response_class=StreamingResponse)
+async def export_goals(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Export all of the current user's goals
+    Streams straight from the database cursor, so memory use stays flat for any number of goals
+    """
+    rows = export_rows(
+        await goals_repo.iter_goals(current_user["id"], settings.EXPORT_BATCH_SIZE),
+        goals_repo.EXPORT_FIELDS,
+        format
+    )
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="goals.{format}"'}
+    )
 
 @router.get("/goals/{goal_id}", response_model=GoalResponse)
 async def get_goal(
@@ -255,19 +188,7 @@ async def get_goal(
     current_user: dict = Depends(get_current_user)
 ):
     """Get a specific goal"""
-    db = await get_database()
-    if db is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Database connection not available"
-        )
-    
-    goals_collection = db["goals"]
-    
-    goal = await goals_collection.find_one({
-        "_id": ObjectId(goal_id),
-        "user_id": current_user["id"]
-    })
+    goal = await goals_repo.get_goal(goal_id, current_user["id"])
     
     if not goal:
         raise HTTPException(
@@ -275,74 +196,37 @@ async def get_goal(
             detail="Goal not found"
         )
     
-    return goal_to_response(goal)
+    return goal
 
 @router.put("/goals/{goal_id}", response_model=GoalResponse)
 async def update_goal(
     goal_id: str,
     goal_update: GoalUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limit())
 ):
     """Update a goal"""
-    db = await get_database()
-    if db is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Database connection not available"
-        )
-    
-    goals_collection = db["goals"]
+    update_data = goal_update.model_dump(exclude_unset=True)
+    update_data["updated_at"] = datetime.utcnow()
     
-    existing_goal = await goals_collection.find_one({
-        "_id": ObjectId(goal_id),
-        "user_id": current_user["id"]
-    })
+    # ✅ OPTIMIZATION: One find_one_and_update instead of find + update + find;
+    # status is derived from the stored target_count in the same atomic write
+    updated_goal = await goals_repo.update_goal(goal_id, current_user["id"], update_data)
     
-    if not existing_goal:
+    if not updated_goal:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Goal not found"
         )
     
-    update_data = goal_update.model_dump(exclude_unset=True)
-    update_data["updated_at"] = datetime.utcnow()
-    
-    # Update status based on progress
-    if "completed_count" in update_data and "target_count" in existing_goal:
-        if update_data["completed_count"] >= existing_goal["target_count"]:
-            update_data["status"] = "completed"
-        else:
-            update_data["status"] = "in_progress"
-    
-    await goals_collection.update_one(
-        {"_id": ObjectId(goal_id)},
-        {"$set": update_data}
-    )
-    
-    updated_goal = await goals_collection.find_one({"_id": ObjectId(goal_id)})
-    return goal_to_response(updated_goal)
+    return updated_goal
 
-@router.delete("/goals/{goal_id}")
+@router.delete("/goals/{goal_id}", response_model=MessageResponse)
 async def delete_goal(
     goal_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limit())
 ):
     """Delete a goal"""
-    db = await get_database()
-    if db is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Database connection not available"
-        )
-    
-    goals_collection = db["goals"]
-    
-    result = await goals_collection.delete_one({
-        "_id": ObjectId(goal_id),
-        "user_id": current_user["id"]
-    })
-    
-    if result.deleted_count == 0:
+    if not await goals_repo.delete_goal(goal_id, current_user["id"]):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Goal not found"
@@ -350,60 +234,10 @@ async def delete_goal(
     
     return {"message": "Goal deleted successfully"}
 
-@router.get("/goals/stats/summary")
+@router.get("/goals/stats/summary", response_model=GoalStats)
 async def get_goal_stats(current_user: dict = Depends(get_current_user)):
     """
     ✅ OPTIMIZED: Get goal statistics using aggregation pipeline
     - Reduced from 4 separate count queries to 1 aggregation query
     """
-    db = await get_database()
-    if db is None:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Database connection not available"
-        )
-    
-    goals_collection = db["goals"]
-    
-    # ✅ Use aggregation pipeline for a single query
-    pipeline = [
-        {"$match": {"user_id": current_user["id"]}},
-        {
-            "$group": {
-                "_id": None,
-                "total_goals": {"$sum": 1},
-                "completed_goals": {
-                    "$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}
-                },
-                "pending_goals": {
-                    "$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}
-                },
-                "in_progress_goals": {
-                    "$sum": {"$cond": [{"$eq": ["$status", "in_progress"]}, 1, 0]}
-                }
-            }
-        }
-    ]
-    
-    result = await goals_collection.aggregate(pipeline).to_list(length=1)
-    
-    if not result:
-        return {
-            "total_goals": 0,
-            "completed_goals": 0,
-            "pending_goals": 0,
-            "in_progress_goals": 0,
-            "completion_rate": 0
-        }
-    
-    stats = result[0]
-    total = stats["total_goals"]
-    completed = stats["completed_goals"]
-    
-    return {
-        "total_goals": total,
-        "completed_goals": completed,
-        "pending_goals": stats["pending_goals"],
-        "in_progress_goals": stats["in_progress_goals"],
-        "completion_rate": (completed / total * 100) if total > 0 else 0
-    }
+    return await goals_repo.goal_stats(current_user["id"])
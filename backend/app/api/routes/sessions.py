@@ -1,26 +1,35 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.rate_limit import rate_limit
 from app.core.security import get_current_user
-from app.db.mongodb import get_collection
-from app.models.session import Session, SessionCreate, SessionUpdate
+from app.db.write_buffer import session_buffer, apply_session_deltas
+from app.models.common import MessageResponse
+from app.models.session import (
+    Session, SessionCreate, SessionCreated, SessionUpdate, SessionResponse,
+    BulkSessionIngest, BulkSessionResult
+)
+from app.repositories import sessions as sessions_repo, rollups as rollups_repo, goals as goals_repo
 from app.utils.calorie_calculator import calculate_calories
-from typing import List, Optional
+from app.utils.export import export_rows, EXPORT_MEDIA_TYPES
+from typing import List, Literal, Optional
 from datetime import datetime, timedelta
 from bson import ObjectId
 
 router = APIRouter()
 
-@router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=SessionCreated, status_code=status.HTTP_201_CREATED)
 async def create_session(
     session: SessionCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limit())
 ):
     """
     Create a new exercise session
     """
     try:
-        sessions_collection = await get_collection("sessions")
-        
         session_dict = session.model_dump()
+        # Generate the id locally so the write can be journaled and replayed idempotently
+        session_dict["_id"] = ObjectId()
         session_dict["user_id"] = current_user["id"]
         session_dict["timestamp"] = datetime.utcnow()
         session_dict["created_at"] = datetime.utcnow()
@@ -28,23 +37,100 @@ async def create_session(
         session_dict["reps"] = 0
         session_dict["completed"] = False
         
-        result = await sessions_collection.insert_one(session_dict)
+        collection_name = await sessions_repo.insert_session(session_dict)
+        # Later PUTs for this session are served from the buffer without a read;
+        # nothing is counted in daily_rollups yet, so the next flush adds it
+        session_buffer.seed(session_dict, collection_name, accounted=rollups_repo.session_metrics(None))
         
         return {
-            "session_id": str(result.inserted_id),
+            "session_id": str(session_dict["_id"]),
             "exercise_name": session_dict["exercise_name"],
             "exercise_type": session_dict["exercise_type"],
             "reps": 0,
             "completed": False
         }
-        
+    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create session: {str(e)}"
         )
 
-@router.get("/{session_id}")
+@router.post("/bulk", response_model=BulkSessionResult)
+async def ingest_sessions(
+    batch: BulkSessionIngest,
+    current_user: dict = Depends(rate_limit(cost=10))
+):
+    """
+    ✅ OPTIMIZED: Upload sessions recorded offline in one request
+    - Calories for the whole batch are computed in one pass
+    - All sessions are written with one unordered bulk_write of upserts keyed by the client ids,
+      so a batch resent after a dropped response is not counted twice
+    - Daily rollups, stats and goal progress for the new sessions are written in the same pass
+    """
+    now = datetime.utcnow()
+    documents = []
+    for offline in batch.sessions:
+        documents.append({
+            "_id": ObjectId(offline.id),
+            "user_id": current_user["id"],
+            "exercise_name": offline.exercise_name,
+            "exercise_type": offline.exercise_type,
+            "reps": offline.reps,
+            "duration": offline.duration,
+            "calories_burned": calculate_calories(
+                reps=offline.reps,
+                duration_seconds=offline.duration,
+                exercise_type=offline.exercise_type,
+                body_weight_kg=70  # Default weight
+            ),
+            "completed": True,
+            "timestamp": offline.timestamp,
+            "created_at": offline.timestamp,
+            "updated_at": now
+        })
+    
+    inserted, rejected, failed = await sessions_repo.ingest_sessions(current_user["id"], documents)
+    
+    # Only newly stored sessions count towards rollups, stats and goals
+    await apply_session_deltas([(doc, rollups_repo.session_metrics(doc)) for doc in inserted])
+    progress = {}
+    for doc in inserted:
+        key = (doc["exercise_type"], rollups_repo.session_day(doc))
+        progress[key] = progress.get(key, 0) + doc["reps"]
+    await goals_repo.record_progress_many(
+        current_user["id"],
+        [(exercise_type, goal_date, reps) for (exercise_type, goal_date), reps in progress.items() if reps]
+    )
+    
+    return BulkSessionResult(
+        inserted=len(inserted),
+        duplicates=len(documents) - len(inserted) - len(rejected) - len(failed),
+        rejected=[str(_id) for _id in rejected],
+        failed=[str(_id) for _id in failed]
+    )
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_sessions(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Export the current user's full session history
+    Streams straight from the database cursor, so memory use stays flat for any history size
+    """
+    rows = export_rows(
+        await sessions_repo.iter_sessions(current_user["id"], settings.EXPORT_BATCH_SIZE),
+        sessions_repo.EXPORT_FIELDS,
+        format
+    )
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="sessions.{format}"'}
+    )
+
+@router.get("/{session_id}", response_model=SessionResponse)
 async def get_session(
     session_id: str,
     current_user: dict = Depends(get_current_user)
@@ -53,12 +139,12 @@ async def get_session(
     Get a specific session by ID
     """
     try:
-        sessions_collection = await get_collection("sessions")
-        
-        session = await sessions_collection.find_one({
-            "_id": ObjectId(session_id),
-            "user_id": current_user["id"]
-        })
+        # Serve buffered state first so reads see updates not yet flushed
+        session = session_buffer.get(session_id)
+        if session is not None and session["user_id"] != current_user["id"]:
+            session = None
+        elif session is None:
+            session = await sessions_repo.find_session(session_id, current_user["id"])
         
         if not session:
             raise HTTPException(
@@ -66,42 +152,60 @@ async def get_session(
                 detail="Session not found"
             )
         
-        session["_id"] = str(session["_id"])
-        return session
-        
+        return SessionResponse.model_validate(session)
+    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get session: {str(e)}"
         )
 
-@router.put("/{session_id}")
+@router.put("/{session_id}", response_model=SessionResponse, response_model_exclude_unset=True)
 async def update_session(
     session_id: str,
     session_update: SessionUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limit())
 ):
     """
     Update a session
     """
     try:
-        sessions_collection = await get_collection("sessions")
+        update_data = session_update.model_dump(exclude_unset=True)
+        update_data["updated_at"] = datetime.utcnow()
+        completed = bool(update_data.get("completed"))
+        already_written = False
         
-        # Check if session exists and belongs to user
-        existing_session = await sessions_collection.find_one({
-            "_id": ObjectId(session_id),
-            "user_id": current_user["id"]
-        })
+        # ✅ OPTIMIZATION: Sessions already in the write buffer need no read at all
+        existing_session = session_buffer.get(session_id)
+        was_completed = bool(existing_session and existing_session.get("completed"))
+        if existing_session is None:
+            if not await sessions_repo.can_write_directly():
+                # Offline: journal the update (the exercise type isn't known, so no calorie estimate)
+                await sessions_repo.journal_session_update(session_id, current_user["id"], update_data)
+                return SessionResponse.model_validate({"_id": session_id, **update_data})
+            
+            # Apply the update in one round trip; the user_id filter doubles as
+            # the ownership check. The old document is what daily_rollups holds,
+            # so the buffer flush writes the rollup delta.
+            previous_session, collection_name = await sessions_repo.update_session(
+                session_id, current_user["id"], update_data
+            )
+            if previous_session:
+                was_completed = bool(previous_session.get("completed"))
+                existing_session = {**previous_session, **update_data}
+                session_buffer.seed(
+                    existing_session, collection_name,
+                    accounted=rollups_repo.session_metrics(previous_session)
+                )
+                already_written = True
         
-        if not existing_session:
+        # Check if session exists and belongs to user
+        if not existing_session or existing_session["user_id"] != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Session not found"
             )
         
-        update_data = session_update.model_dump(exclude_unset=True)
-        update_data["updated_at"] = datetime.utcnow()
-        
         # Auto-calculate calories if reps and duration are provided
         if "reps" in update_data and "duration" in update_data:
             reps = update_data["reps"]
@@ -118,64 +222,78 @@ async def update_session(
             )
             update_data["calories_burned"] = calories
         
-        await sessions_collection.update_one(
-            {"_id": ObjectId(session_id)},
-            {"$set": update_data}
-        )
+        if already_written:
+            # Only the derived calories still need writing
+            update_data = {k: v for k, v in update_data.items() if k == "calories_burned"}
         
-        updated_session = await sessions_collection.find_one({"_id": ObjectId(session_id)})
-        updated_session["_id"] = str(updated_session["_id"])
+        # Merge into the buffer; a finished session is written through immediately
+        updated_session = await session_buffer.update(session_id, update_data, flush_now=completed)
         
-        return updated_session
+        # ✅ OPTIMIZATION: Completing a session advances the goal for the exercise
+        # server-side and returns it, replacing the client's goal PUT and refetch.
+        # Progress goes to the session's UTC day, as in bulk ingest and the rollups.
+        goal = None
+        if completed and not was_completed and updated_session.get("reps"):
+            goal = await goals_repo.record_progress(
+                current_user["id"],
+                updated_session.get("exercise_type"),
+                rollups_repo.session_day(updated_session),
+                updated_session["reps"]
+            )
         
+        response = SessionResponse.model_validate(updated_session)
+        if goal is not None:
+            response.goal = goal
+        return response
+    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update session: {str(e)}"
         )
 
-@router.get("/")
+@router.get("/", response_model=List[SessionResponse])
 async def get_sessions(
+    response: Response,
     exercise_type: Optional[str] = None,
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Get all sessions for current user
+    Get sessions for current user, newest first
+    When there are more, the X-Next-Cursor header holds the cursor to pass as ?cursor= for the next page
     """
-    sessions_collection = await get_collection("sessions")
-    
-    query = {"user_id": current_user["id"]}
-    if exercise_type:
-        query["exercise_type"] = exercise_type
-    
-    cursor = sessions_collection.find(query).sort("created_at", -1).limit(limit)
-    sessions = await cursor.to_list(length=limit)
-    
-    for session in sessions:
-        session["_id"] = str(session["_id"])
+    try:
+        sessions, next_cursor = await sessions_repo.list_sessions(
+            current_user["id"], exercise_type, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return sessions
 
-@router.delete("/{session_id}")
+@router.delete("/{session_id}", response_model=MessageResponse)
 async def delete_session(
     session_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limit())
 ):
     """
     Delete a session
     """
-    sessions_collection = await get_collection("sessions")
-    
-    result = await sessions_collection.delete_one({
-        "_id": ObjectId(session_id),
-        "user_id": current_user["id"]
-    })
-    
-    if result.deleted_count == 0:
+    deleted = await sessions_repo.delete_session(session_id, current_user["id"])
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
+    # Take back whatever the session had contributed to daily rollups and stats
+    await session_buffer.remove(deleted)
+    
     return {"message": "Session deleted successfully"}
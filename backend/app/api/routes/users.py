@@ -1,19 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response, status
+from app.core.rate_limit import rate_limit
 from app.core.security import get_current_user
-from app.db.mongodb import get_collection
-from app.models.user import User, UserUpdate
+from app.models.user import User, UserUpdate, UserProfile, AvatarStatus, AvatarList, AvatarSelection, UserStats
+from app.models.rollup import ActivitySummary
+from app.models.session import SessionHistory
+from app.repositories import sessions as sessions_repo, users as users_repo, rollups as rollups_repo, stats as stats_repo
+from app.utils.etag import conditional, weak_etag
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date, timedelta
 
 router = APIRouter()
 
-@router.get("/me")
-async def get_current_user_profile(current_user: dict = Depends(get_current_user)):
+@router.get("/me", response_model=UserProfile)
+async def get_current_user_profile(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: dict = Depends(get_current_user)
+):
     """
-    Get current user profile
+    Get current user profile (answers If-None-Match with 304 while it is unchanged)
     """
-    users_collection = await get_collection("users")
-    user = await users_collection.find_one({"user_id": current_user["id"]})
+    user = await users_repo.get_profile(current_user["id"])
     
     if not user:
         raise HTTPException(
@@ -21,94 +28,85 @@ async def get_current_user_profile(current_user: dict = Depends(get_current_user
             detail="User not found"
         )
     
-    user['_id'] = str(user['_id'])
-    return user
+    return conditional(response, if_none_match, weak_etag(user.model_dump())) or user
 
-@router.put("/me")
+@router.put("/me", response_model=UserProfile)
 async def update_current_user(
     user_update: UserUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limit())
 ):
     """
     Update current user profile
     """
-    users_collection = await get_collection("users")
-    
     update_data = user_update.model_dump(exclude_unset=True)
     
-    if update_data:
-        await users_collection.update_one(
-            {"user_id": current_user["id"]},
-            {"$set": update_data}
-        )
+    # ✅ OPTIMIZATION: Update and read back in a single round trip
+    updated_user = await users_repo.update_profile(current_user["id"], update_data)
     
-    updated_user = await users_collection.find_one({"user_id": current_user["id"]})
-    updated_user['_id'] = str(updated_user['_id'])
+    if not updated_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
     
     return updated_user
 
-@router.get("/stats")
+@router.get("/stats", response_model=UserStats)
 async def get_user_stats(current_user: dict = Depends(get_current_user)):
     """
     Get user statistics
     """
-    sessions_collection = await get_collection("sessions")
-    
-    # Get total sessions
-    total_sessions = await sessions_collection.count_documents({"user_id": current_user["id"]})
-    
-    # Get total exercises completed
-    pipeline = [
-        {"$match": {"user_id": current_user["id"]}},
-        {"$group": {
-            "_id": None,
-            "total_reps": {"$sum": "$reps_completed"},
-            "total_duration": {"$sum": "$duration"}
-        }}
-    ]
-    
-    result = await sessions_collection.aggregate(pipeline).to_list(length=1)
-    
-    if result:
-        stats = result[0]
-        return {
-            "total_sessions": total_sessions,
-            "total_reps": stats.get("total_reps", 0),
-            "total_duration": stats.get("total_duration", 0)
-        }
-    
+    # ✅ OPTIMIZATION: Single point read of the materialized stats document (cached)
+    totals = await stats_repo.get_user_stats(current_user["id"])
     return {
-        "total_sessions": 0,
-        "total_reps": 0,
-        "total_duration": 0
+        "total_sessions": totals["session_count"],
+        "total_reps": totals["reps"],
+        "total_duration": totals["duration"]
     }
 
-@router.get("/history")
-async def get_user_history(
-    limit: int = 10,
+@router.get("/activity", response_model=ActivitySummary)
+async def get_user_activity(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    Get user exercise history
+    Get per-day activity (reps, duration, calories, sessions per exercise) and the current streak
+    Defaults to the last 30 days
     """
-    sessions_collection = await get_collection("sessions")
-    
-    cursor = sessions_collection.find(
-        {"user_id": current_user["id"]}
-    ).sort("timestamp", -1).limit(limit)
+    today = datetime.utcnow().date()
+    end_date = end_date or today
+    start_date = start_date or end_date - timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must not be after end_date"
+        )
     
-    sessions = await cursor.to_list(length=limit)
+    days = await rollups_repo.activity_days(current_user["id"], start_date.isoformat(), end_date.isoformat())
+    streak = await rollups_repo.current_streak(current_user["id"], today)
     
-    for session in sessions:
-        session['_id'] = str(session['_id'])
-        # Ensure timestamp is ISO format string
-        if 'timestamp' in session and isinstance(session['timestamp'], datetime):
-            session['timestamp'] = session['timestamp'].isoformat()
-        # Fallback to created_at if timestamp doesn't exist
-        elif 'created_at' in session and isinstance(session['created_at'], datetime):
-            session['timestamp'] = session['created_at'].isoformat()
+    return ActivitySummary(days=days, current_streak=streak)
+
+@router.get("/history", response_model=SessionHistory)
+async def get_user_history(
+    limit: int = Query(10, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get user exercise history, newest first
+    Pass next_cursor from the previous page as cursor to fetch the next one
+    """
+    try:
+        sessions, next_cursor = await sessions_repo.session_history(current_user["id"], limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    return {"sessions": sessions}
+    return SessionHistory(sessions=sessions, next_cursor=next_cursor)
 
 # Avatar Management Routes
 
@@ -131,39 +129,38 @@ AVAILABLE_AVATARS = [
     {"id": "bodybuilder-female", "name": "Bodybuilder", "gender": "female", "category": "strength"},
 ]
 
-@router.get("/avatars/list")
-async def get_available_avatars():
+# ✅ OPTIMIZATION: The catalog is static, so its response and ETag are built once
+# and clients may cache it for a day
+AVATAR_LIST = AvatarList(avatars=AVAILABLE_AVATARS, total=len(AVAILABLE_AVATARS))
+AVATAR_LIST_ETAG = weak_etag(AVAILABLE_AVATARS)
+AVATAR_LIST_CACHE_CONTROL = "public, max-age=86400"
+
+@router.get("/avatars/list", response_model=AvatarList)
+async def get_available_avatars(response: Response, if_none_match: Optional[str] = Header(None)):
     """
     Get list of all available avatars
     """
-    return {
-        "avatars": AVAILABLE_AVATARS,
-        "total": len(AVAILABLE_AVATARS)
-    }
+    return conditional(response, if_none_match, AVATAR_LIST_ETAG, AVATAR_LIST_CACHE_CONTROL) or AVATAR_LIST
 
-@router.get("/me/avatar")
+@router.get("/me/avatar", response_model=AvatarStatus)
 async def get_my_avatar(current_user: dict = Depends(get_current_user)):
     """
     Get current user's avatar
     """
-    users_collection = await get_collection("users")
-    user = await users_collection.find_one({"user_id": current_user["id"]})
+    avatar = await users_repo.get_avatar(current_user["id"])
     
-    if not user:
+    if not avatar:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return {
-        "avatar": user.get("avatar"),
-        "avatar_selected": user.get("avatar_selected", False)
-    }
+    return avatar
 
-@router.post("/me/avatar")
+@router.post("/me/avatar", response_model=AvatarSelection)
 async def select_avatar(
     avatar_data: dict,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(rate_limit())
 ):
     """
     User selects their avatar
@@ -184,21 +181,9 @@ async def select_avatar(
             detail=f"Invalid avatar_id. Must be one of: {', '.join(valid_avatar_ids)}"
         )
     
-    users_collection = await get_collection("users")
-    
-    # Update user document
-    result = await users_collection.update_one(
-        {"user_id": current_user["id"]},
-        {
-            "$set": {
-                "avatar": avatar_id,
-                "avatar_selected": True,
-                "last_login": datetime.utcnow()
-            }
-        }
-    )
+    updated = await users_repo.set_avatar(current_user["id"], avatar_id)
     
-    if result.modified_count == 0:
+    if not updated:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found or avatar already set"
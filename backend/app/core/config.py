@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Literal
 
 class Settings(BaseSettings):
     # MongoDB
@@ -9,11 +9,20 @@ class Settings(BaseSettings):
     # Google OAuth
     GOOGLE_CLIENT_ID: str
     GOOGLE_CLIENT_SECRET: str
+    # Certificates signing Google ID tokens, cached for their Cache-Control max-age
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
+    GOOGLE_CERTS_DEFAULT_MAX_AGE_SECONDS: float = 3600.0  # Without a max-age
+    GOOGLE_CERTS_REFRESH_MARGIN_SECONDS: float = 300.0
+    GOOGLE_CERTS_RETRY_SECONDS: float = 60.0
     
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # A used refresh token presented again this soon gets the same successor
+    # (concurrent refreshes from several tabs) instead of revoking its family
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS: float = 10.0
     
     # CORS
     FRONTEND_URL: str = "http://localhost:3000"
@@ -22,6 +31,58 @@ class Settings(BaseSettings):
         "https://fit-detect.vercel.app"
     ]
     
+    # Offline write journal
+    JOURNAL_PATH: str = "offline_journal.sqlite3"
+    JOURNAL_FLUSH_INTERVAL_SECONDS: float = 5.0
+    JOURNAL_BATCH_SIZE: int = 500
+    # Replays of one entry that may fail (other than on a lost connection) before it is set aside
+    JOURNAL_MAX_ATTEMPTS: int = 5
+    
+    # Session write buffer
+    SESSION_BUFFER_WINDOW_SECONDS: float = 2.0
+    SESSION_BUFFER_MAX_ENTRIES: int = 10000
+    SESSION_BUFFER_IDLE_SECONDS: float = 300.0
+    
+    # Session storage: "collection" (plain sessions collection), "dual" while
+    # scripts/migrate_sessions_to_timeseries.py moves data, then "timeseries"
+    SESSION_STORAGE: Literal["collection", "dual", "timeseries"] = "collection"
+    
+    # Goal dates: "dual" matches goals stored with ISO string dates as well as
+    # native dates; "native" once migration 1 (scripts/migrate.py) has converted them
+    GOAL_DATES: Literal["dual", "native"] = "dual"
+    
+    # Exports
+    EXPORT_BATCH_SIZE: int = 500
+    
+    # Caches (set CACHE_REDIS_URL to share them between workers; needs the redis package)
+    CACHE_REDIS_URL: str = ""
+    USER_STATS_CACHE_TTL_SECONDS: float = 30.0
+    USER_STATS_CACHE_MAX_ENTRIES: int = 10000
+    GOAL_CACHE_TTL_SECONDS: float = 300.0
+    GOAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # Verified JWTs are cached until exp, but for at most this long
+    TOKEN_CACHE_MAX_TTL_SECONDS: float = 300.0
+    TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    
+    # Background job marking past goals that were never completed as missed
+    GOAL_EXPIRY_INTERVAL_SECONDS: float = 3600.0
+    GOAL_EXPIRY_BATCH_SIZE: int = 500
+    GOAL_EXPIRY_PAUSE_SECONDS: float = 0.2
+    
+    # A dashboard section slower than this is returned empty rather than holding up the page
+    DASHBOARD_SECTION_TIMEOUT_SECONDS: float = 2.0
+    
+    # Seconds between checks of the exercise catalog version (reloaded when it moves)
+    EXERCISE_CATALOG_CHECK_SECONDS: float = 60.0
+    
+    # Per-user token buckets for write endpoints (shared through CACHE_REDIS_URL when set);
+    # each route spends its cost in tokens
+    RATE_LIMIT_CAPACITY: float = 30.0
+    RATE_LIMIT_REFILL_PER_SECOND: float = 1.0
+    RATE_LIMIT_MAX_USERS: int = 100000
+    
     # Environment
     ENVIRONMENT: str = "development"
     
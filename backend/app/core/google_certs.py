@@ -0,0 +1,122 @@
+# Google signing certificates
+"""
+Local verification of Google ID tokens.
+
+Google rotates the certificates that sign ID tokens and publishes them at
+GOOGLE_CERTS_URL with a Cache-Control max-age. The certificates are kept in
+memory for that long and a background task fetches the next set shortly
+before they expire. Login verifies tokens against the cached keys, so it only
+waits on the network when the cache is empty or expired (startup, or a failed
+refresh), or when a token is signed with a key the cache hasn't seen yet.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from google.auth import exceptions as google_exceptions, jwt as google_jwt
+from google.auth.transport import requests
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+@lru_cache(maxsize=1)
+def get_cached_request():
+    """Cache the Request object (and its connection pool) used to fetch certificates"""
+    return requests.Request()
+
+def _fetch_certs(url: str) -> Tuple[Dict[str, str], float]:
+    """Download the certificates and how long they may be cached, in seconds"""
+    response = get_cached_request()(url, method="GET")
+    if response.status != 200:
+        raise google_exceptions.TransportError(f"Could not fetch certificates at {url}: HTTP {response.status}")
+    match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+    max_age = float(match.group(1)) if match else settings.GOOGLE_CERTS_DEFAULT_MAX_AGE_SECONDS
+    return json.loads(response.data.decode("utf-8")), max_age
+
+class GoogleCertCache:
+    def __init__(self, url: str):
+        self.url = url
+        self.certs: Dict[str, str] = {}
+        self.fetched_at = float("-inf")  # time.monotonic()
+        self.expires_at = 0.0
+        self.max_age = 0.0
+        self.refreshes = 0
+        self._lock = asyncio.Lock()
+
+    def fresh(self) -> bool:
+        return bool(self.certs) and time.monotonic() < self.expires_at
+
+    async def refresh(self):
+        """Fetch the current certificates; concurrent callers share one fetch"""
+        started = time.monotonic()
+        async with self._lock:
+            if self.fetched_at >= started:
+                return
+            loop = asyncio.get_running_loop()
+            certs, max_age = await loop.run_in_executor(None, _fetch_certs, self.url)
+            self.certs = certs
+            self.fetched_at = time.monotonic()
+            self.expires_at = self.fetched_at + max_age
+            self.max_age = max_age
+            self.refreshes += 1
+
+    async def get_certs(self) -> Dict[str, str]:
+        if not self.fresh():
+            await self.refresh()
+        return self.certs
+
+    async def verify(self, token: str, audience: str, clock_skew_in_seconds: int = 10) -> dict:
+        """
+        Claims of a Google ID token verified locally against the cached
+        certificates. Raises ValueError for an invalid token, as
+        id_token.verify_oauth2_token does.
+        """
+        certs = await self.get_certs()
+        key_id = google_jwt.decode_header(token).get("kid")
+        recently_fetched = time.monotonic() - self.fetched_at < settings.GOOGLE_CERTS_RETRY_SECONDS
+        if key_id not in certs and not recently_fetched:
+            # Possibly signed with a key published since the last fetch (throttled,
+            # so tokens with made-up key ids can't trigger a fetch per request)
+            await self.refresh()
+            certs = self.certs
+
+        idinfo = google_jwt.decode(token, certs=certs, audience=audience, clock_skew_in_seconds=clock_skew_in_seconds)
+        if idinfo.get("iss") not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
+        return idinfo
+
+    def refresh_delay(self) -> float:
+        """Seconds until the next background refresh: a little before the certificates expire"""
+        remaining = self.expires_at - time.monotonic()
+        margin = max(settings.GOOGLE_CERTS_REFRESH_MARGIN_SECONDS, remaining * 0.1)
+        # A max-age shorter than the margin would otherwise refetch every second
+        margin = min(margin, self.max_age / 2)
+        return max(1.0, remaining - margin)
+
+google_certs = GoogleCertCache(settings.GOOGLE_CERTS_URL)
+
+async def run_cert_refresher(cache: Optional[GoogleCertCache] = None):
+    """Background task: keep the Google certificates fresh so login never waits on a fetch"""
+    cache = cache or google_certs
+    while True:
+        try:
+            await cache.refresh()
+            logger.info(f"✅ Fetched {len(cache.certs)} Google signing certificates")
+            delay = cache.refresh_delay()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Keep the current certificates and retry; login fetches inline once they expire
+            logger.warning(f"⚠️ Google certificate refresh failed, retrying: {type(e).__name__}: {e}")
+            delay = settings.GOOGLE_CERTS_RETRY_SECONDS
+        await asyncio.sleep(delay)
@@ -0,0 +1,129 @@
+# Rate limiting
+"""
+Per-user token buckets for write endpoints. Each user's bucket holds up to
+RATE_LIMIT_CAPACITY tokens and refills at RATE_LIMIT_REFILL_PER_SECOND. A
+route spends its cost on every request, and a request that would overdraw
+the bucket is rejected with 429 and a Retry-After for when enough tokens
+will be back. Checks are O(1).
+
+Buckets live in this process by default. With CACHE_REDIS_URL set, they live
+in Redis (updated atomically by a Lua script), so every worker enforces the
+same budget.
+"""
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.utils.cache import shared_redis
+
+logger = logging.getLogger(__name__)
+
+class MemoryRateLimitBackend:
+    """Token buckets local to this process; the least recently active users are dropped beyond max_keys"""
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: str, cost: float) -> float:
+        """Spend cost tokens; 0 if allowed, else the seconds until they would be available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / self.refill_per_second
+        self._buckets[key] = (tokens, now)
+        # A dropped user starts over with a full bucket, which only errs towards allowing
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+# KEYS[1]: bucket; ARGV: capacity, refill per second, cost. Returns the wait in seconds.
+_ACQUIRE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+class RedisRateLimitBackend:
+    """
+    Token buckets shared by every worker through Redis. Buckets expire once
+    they would be full again. Redis errors let the request through rather
+    than failing it.
+    """
+
+    def __init__(self, client, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._acquire = client.register_script(_ACQUIRE_SCRIPT)
+
+    async def acquire(self, key: str, cost: float) -> float:
+        try:
+            wait = await self._acquire(
+                keys=[f"rate_limit:{key}"],
+                args=[self.capacity, self.refill_per_second, cost]
+            )
+            return float(wait)
+        except Exception as e:
+            logger.warning(f"⚠️ Rate limit check failed, allowing the request: {e}")
+            return 0.0
+
+def create_limiter():
+    client = shared_redis()
+    if client is not None:
+        return RedisRateLimitBackend(client, settings.RATE_LIMIT_CAPACITY, settings.RATE_LIMIT_REFILL_PER_SECOND)
+    return MemoryRateLimitBackend(
+        settings.RATE_LIMIT_CAPACITY, settings.RATE_LIMIT_REFILL_PER_SECOND, settings.RATE_LIMIT_MAX_USERS
+    )
+
+limiter = create_limiter()
+throttled_requests = 0
+
+def rate_limit(cost: float = 1.0):
+    """
+    Dependency for a write route: the authenticated user (as get_current_user)
+    after spending cost tokens from their bucket, or 429 with Retry-After
+    """
+    # A cost above the capacity could never be paid
+    cost = min(cost, settings.RATE_LIMIT_CAPACITY)
+
+    async def check(current_user: dict = Depends(get_current_user)) -> dict:
+        global throttled_requests
+        wait = await limiter.acquire(current_user["id"], cost)
+        if wait > 0:
+            throttled_requests += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, slow down",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+        return current_user
+
+    return check
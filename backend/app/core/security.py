@@ -1,3 +1,5 @@
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -5,11 +7,21 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
-from app.db.mongodb import get_database
+from app.repositories import users as users_repo
+from app.utils.cache import TTLCache, register_cache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+# ✅ OPTIMIZATION: Decoded payloads of verified tokens, keyed by the token's
+# SHA-256 so the cache never holds usable credentials. Entries expire at the
+# token's exp, capped at TOKEN_CACHE_MAX_TTL_SECONDS; expiry runs on the
+# monotonic clock, so a wall-clock jump can't extend an entry, and exp is
+# checked again against the wall clock on every hit.
+verified_tokens = register_cache("verified_tokens", TTLCache(
+    settings.TOKEN_CACHE_MAX_ENTRIES, settings.TOKEN_CACHE_MAX_TTL_SECONDS
+))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
@@ -23,16 +35,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(token: str):
-    """Verify JWT token"""
+    """Verify JWT token (signature checks are skipped for tokens verified recently)"""
+    key = hashlib.sha256(token.encode()).digest()
+    payload = verified_tokens.get(key)
+    if payload is not None and payload["exp"] > time.time():
+        return payload
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    # Tokens without exp are never cached
+    remaining = payload.get("exp", 0) - time.time()
+    if remaining > 0:
+        verified_tokens.set(key, payload, min(remaining, settings.TOKEN_CACHE_MAX_TTL_SECONDS))
+    return payload
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user from JWT token"""
@@ -46,9 +68,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Could not validate credentials",
         )
     
-    # Get user from database
-    db = await get_database()
-    user = await db.users.find_one({"user_id": user_id})
+    # ✅ OPTIMIZATION: Principal fields come from the principal cache; the database is read on a miss
+    user = await users_repo.get_principal(user_id)
     
     if user is None:
         raise HTTPException(
@@ -56,7 +77,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="User not found",
         )
     
-    return {"id": user["user_id"], "email": user.get("email"), "name": user.get("name")}
+    return user
 
 def get_password_hash(password: str):
     """Hash password"""
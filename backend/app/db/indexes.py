@@ -0,0 +1,118 @@
+# Index registry
+"""
+Declarative index registry.
+
+Repositories declare the indexes their queries need, and a sample of each
+query shape, right next to the code that runs them (plus any collection that
+needs creation options, such as a time-series collection, which has to exist
+before its indexes). ensure_indexes() applies every declared index at startup (createIndexes is a no-op for an index that
+already exists), and scripts/verify_query_plans.py runs explain() on every
+declared query shape to catch collection scans and in-memory sorts.
+"""
+
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    options: Dict[str, Any]
+
+class CollectionSpec(NamedTuple):
+    name: str
+    options: Dict[str, Any]
+
+class QueryShape(NamedTuple):
+    collection: str
+    name: str
+    filter: Dict[str, Any]
+    sort: Optional[Tuple[Tuple[str, int], ...]]
+    projection: Optional[Dict[str, Any]]
+
+_collections: List[CollectionSpec] = []
+_indexes: List[IndexSpec] = []
+_queries: List[QueryShape] = []
+
+def declare_collection(name: str, **options):
+    """Register a collection that must be created with options (as for create_collection)"""
+    spec = CollectionSpec(name, options)
+    if spec not in _collections:
+        _collections.append(spec)
+
+def declare_index(collection: str, keys: List[Tuple[str, int]], **options):
+    """Register an index (options as for create_index, e.g. unique=True)"""
+    spec = IndexSpec(collection, tuple(keys), options)
+    if spec not in _indexes:
+        _indexes.append(spec)
+
+def declare_query(
+    collection: str,
+    name: str,
+    filter: Dict[str, Any],
+    sort: Optional[List[Tuple[str, int]]] = None,
+    projection: Optional[Dict[str, Any]] = None
+):
+    """Register a sample of a query a route runs, with representative values"""
+    _queries.append(QueryShape(collection, name, filter, tuple(sort) if sort else None, projection))
+
+def registered_collections() -> List[CollectionSpec]:
+    return list(_collections)
+
+def registered_indexes() -> List[IndexSpec]:
+    return list(_indexes)
+
+def registered_queries() -> List[QueryShape]:
+    return list(_queries)
+
+async def ensure_indexes(database) -> int:
+    """
+    Create every declared collection and index. Safe to run on every startup;
+    a collection or index that cannot be built (e.g. duplicate data for a
+    unique index, or a server too old for time-series collections) is logged
+    and skipped so the API still starts. Returns the number of indexes ensured.
+    """
+    existing = set(await database.list_collection_names())
+    unavailable = set()
+    for spec in _collections:
+        if spec.name in existing:
+            continue
+        try:
+            await database.create_collection(spec.name, **spec.options)
+        except OperationFailure as e:
+            # Creating its indexes would silently create a plain collection instead
+            unavailable.add(spec.name)
+            logger.warning(f"⚠️ Could not create collection {spec.name}: {e}")
+
+    by_collection: Dict[str, List[IndexModel]] = {}
+    for spec in _indexes:
+        if spec.collection in unavailable:
+            continue
+        by_collection.setdefault(spec.collection, []).append(IndexModel(list(spec.keys), **spec.options))
+
+    ensured = 0
+    for collection_name, models in by_collection.items():
+        for model in models:
+            try:
+                await database[collection_name].create_indexes([model])
+                ensured += 1
+            except OperationFailure as e:
+                logger.warning(f"⚠️ Could not create index {model.document['key']} on {collection_name}: {e}")
+    return ensured
+
+def blocking_stages(plan: dict) -> List[str]:
+    """COLLSCAN and in-memory SORT stages anywhere in an explain() plan tree"""
+    found = []
+    stage = plan.get("stage")
+    if stage in ("COLLSCAN", "SORT"):
+        found.append(stage)
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            found.extend(blocking_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        found.extend(blocking_stages(child))
+    return found
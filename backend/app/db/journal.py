@@ -0,0 +1,396 @@
+# Offline write journal
+"""
+Durable write-behind journal used while MongoDB is unreachable.
+
+Writes that cannot reach the database are appended to a local SQLite file and
+replayed in order by a background flusher once the connection is back.
+
+Replay is idempotent, so a batch replayed again after a crash (between its
+bulk_write and the removal of its rows) leaves the database unchanged:
+
+- upserts, $set updates and filtered deletes are idempotent as they are
+- plain inserts (time-series collections can't upsert) are skipped when a
+  document with their _id is already stored
+- $inc and pipeline updates carry the id of their journal entry: the filter
+  excludes documents that already list it in journal_ops, and the update
+  appends it there
+
+An entry MongoDB rejects (a write error) is moved to the dead_writes table,
+as is one that keeps failing for any other reason after JOURNAL_MAX_ATTEMPTS,
+so a single bad write can't hold back everything queued behind it.
+
+Every worker of the API shares the file. A lease row makes sure only one of
+them replays at a time.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from bson import json_util
+from pymongo import DeleteMany, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from app.core.config import settings
+from app.db.mongodb import db, connect_to_mongo, get_collection
+
+logger = logging.getLogger(__name__)
+
+# Field listing the journal entries already applied to a document
+APPLIED_FIELD = "journal_ops"
+
+# How long a flushing worker holds the replay lease without renewing it
+FLUSH_LEASE_SECONDS = 60.0
+
+# Another worker may have journaled since this one last saw the journal empty
+PENDING_RECHECK_SECONDS = 1.0
+
+def journal_update(filter: dict, update, upsert: bool = False) -> dict:
+    """Describe an update_one operation for the journal"""
+    return {"op": "update_one", "filter": filter, "update": update, "upsert": upsert}
+
+def journal_insert(document: dict) -> dict:
+    """Describe an insert_one operation for the journal"""
+    return {"op": "insert_one", "document": document}
+
+def journal_delete(filter: dict) -> dict:
+    """Describe a delete_many operation for the journal"""
+    return {"op": "delete_many", "filter": filter}
+
+def to_write_model(entry: dict):
+    """Convert a journal entry into a pymongo bulk write model"""
+    if entry["op"] == "update_one":
+        return UpdateOne(entry["filter"], entry["update"], upsert=entry.get("upsert", False))
+    if entry["op"] == "insert_one":
+        return InsertOne(entry["document"])
+    if entry["op"] == "delete_many":
+        return DeleteMany(entry["filter"])
+    raise ValueError(f"Unsupported journal operation: {entry['op']}")
+
+def _tagged(entry: dict) -> bool:
+    """Whether an entry needs its id recorded to be replayed safely ($inc or pipeline updates)"""
+    if entry["op"] != "update_one":
+        return False
+    update = entry["update"]
+    return isinstance(update, list) or "$inc" in update
+
+def replay_model(entry: dict, op_id: str):
+    """Write model for replaying an entry: as to_write_model, but applied at most once"""
+    if not _tagged(entry):
+        return to_write_model(entry)
+
+    filter = {**entry["filter"], APPLIED_FIELD: {"$ne": op_id}}
+    update = entry["update"]
+    # A replay only ever repeats the last batch, so that many ids are enough to keep
+    if isinstance(update, list):
+        update = update + [{"$set": {APPLIED_FIELD: {"$slice": [
+            {"$concatArrays": [{"$ifNull": [f"${APPLIED_FIELD}", []]}, [op_id]]},
+            -settings.JOURNAL_BATCH_SIZE
+        ]}}}]
+    else:
+        update = {**update, "$push": {APPLIED_FIELD: {"$each": [op_id], "$slice": -settings.JOURNAL_BATCH_SIZE}}}
+    return UpdateOne(filter, update, upsert=entry.get("upsert", False))
+
+class WriteJournal:
+    """Append-only SQLite journal of pending MongoDB writes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._has_pending: Optional[bool] = None
+        self._checked_at = 0.0
+        self._journal_id: Optional[str] = None
+        self._owner = uuid.uuid4().hex
+        self._failures: Dict[int, int] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_writes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " collection TEXT NOT NULL,"
+                " operation TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_writes ("
+                " id INTEGER PRIMARY KEY,"
+                " collection TEXT NOT NULL,"
+                " operation TEXT NOT NULL,"
+                " error TEXT NOT NULL,"
+                " failed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE TABLE IF NOT EXISTS journal_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS flush_lease ("
+                " id INTEGER PRIMARY KEY CHECK (id = 1),"
+                " owner TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            # Entry ids are only unique within one journal file, so op ids are prefixed with the file's id
+            self._conn.execute(
+                "INSERT OR IGNORE INTO journal_meta (key, value) VALUES ('journal_id', ?)", (uuid.uuid4().hex,)
+            )
+            self._conn.execute("INSERT OR IGNORE INTO flush_lease (id, owner, expires_at) VALUES (1, '', 0)")
+            self._conn.commit()
+            self._journal_id = self._conn.execute(
+                "SELECT value FROM journal_meta WHERE key = 'journal_id'"
+            ).fetchone()[0]
+        return self._conn
+
+    def _op_id(self, row_id: int) -> str:
+        return f"{self._journal_id}:{row_id}"
+
+    def _append(self, collection: str, operations: List[dict]):
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT INTO pending_writes (collection, operation) VALUES (?, ?)",
+                [(collection, json_util.dumps(op, json_options=json_util.CANONICAL_JSON_OPTIONS)) for op in operations]
+            )
+            conn.commit()
+            self._has_pending = True
+
+    def _read_batch(self, limit: int):
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, collection, operation FROM pending_writes ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+            if not rows:
+                self._has_pending = False
+                self._checked_at = time.monotonic()
+        return [(row_id, collection, json_util.loads(operation)) for row_id, collection, operation in rows]
+
+    def _delete_through(self, last_id: int):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM pending_writes WHERE id <= ?", (last_id,))
+            conn.commit()
+
+    def _dead_letter(self, row_id: int, error: str):
+        """Move an entry out of the replay queue, keeping it for inspection"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO dead_writes (id, collection, operation, error, failed_at)"
+                " SELECT id, collection, operation, ?, ? FROM pending_writes WHERE id = ?",
+                (error, time.time(), row_id)
+            )
+            conn.execute("DELETE FROM pending_writes WHERE id = ?", (row_id,))
+            conn.commit()
+        self._failures.pop(row_id, None)
+
+    def _count(self) -> int:
+        with self._lock:
+            count = self._connection().execute("SELECT COUNT(*) FROM pending_writes").fetchone()[0]
+            self._has_pending = count > 0
+            self._checked_at = time.monotonic()
+            return count
+
+    def _dead_count(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM dead_writes").fetchone()[0]
+
+    def _acquire_lease(self) -> bool:
+        """Take (or renew) the replay lease unless another worker holds it"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE flush_lease SET owner = ?, expires_at = ? WHERE id = 1 AND (owner = ? OR expires_at < ?)",
+                (self._owner, now + FLUSH_LEASE_SECONDS, self._owner, now)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def _release_lease(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("UPDATE flush_lease SET expires_at = 0 WHERE id = 1 AND owner = ?", (self._owner,))
+            conn.commit()
+
+    async def append(self, collection: str, operations: List[dict]):
+        """Durably record operations for later replay"""
+        await asyncio.to_thread(self._append, collection, operations)
+
+    async def pending_count(self) -> int:
+        """Number of journaled operations not yet replayed"""
+        return await asyncio.to_thread(self._count)
+
+    async def dead_letter_count(self) -> int:
+        """Number of journaled operations given up on (kept in the dead_writes table)"""
+        return await asyncio.to_thread(self._dead_count)
+
+    async def has_pending(self) -> bool:
+        """Whether any operations are waiting for replay (cached between calls)"""
+        stale = not self._has_pending and time.monotonic() - self._checked_at > PENDING_RECHECK_SECONDS
+        if self._has_pending is None or stale:
+            await self.pending_count()
+        return self._has_pending
+
+    async def flush(self, batch_size: int) -> int:
+        """
+        Replay journaled operations until the journal is empty, one run of
+        consecutive operations on the same collection at a time (so ordering
+        within a collection is preserved). Returns the number of operations
+        replayed, or 0 if another worker is replaying.
+        """
+        if not await asyncio.to_thread(self._acquire_lease):
+            return 0
+        try:
+            replayed = 0
+            while True:
+                batch = await asyncio.to_thread(self._read_batch, batch_size)
+                if not batch:
+                    return replayed
+                if not await asyncio.to_thread(self._acquire_lease):
+                    return replayed
+
+                collection_name = batch[0][1]
+                rows = []
+                for row_id, collection, entry in batch:
+                    if collection != collection_name:
+                        break
+                    rows.append((row_id, entry))
+                replayed += await self._replay(collection_name, rows)
+        finally:
+            await asyncio.to_thread(self._release_lease)
+
+    async def _replay(self, collection_name: str, rows: List[Tuple[int, dict]]) -> int:
+        """Apply rows to one collection and remove them from the journal; returns how many were applied"""
+        collection = await get_collection(collection_name)
+        if collection is None:
+            raise ConnectionFailure("Database connection not available")
+
+        pending = await self._without_stored_inserts(collection, rows)
+        try:
+            if pending:
+                await collection.bulk_write(
+                    [replay_model(entry, self._op_id(row_id)) for row_id, entry in pending],
+                    ordered=True
+                )
+        except ConnectionFailure:
+            raise
+        except BulkWriteError as e:
+            # Ordered: everything before the first error was applied, nothing after it
+            error = e.details["writeErrors"][0]
+            row_id, entry = pending[error["index"]]
+            await asyncio.to_thread(self._delete_through, row_id - 1)
+            if error.get("code") == 11000 and await self._already_applied(collection, entry, row_id):
+                await asyncio.to_thread(self._delete_through, row_id)
+            else:
+                logger.error(f"❌ Journaled write to {collection_name} rejected, moved to dead_writes: {error.get('errmsg')}")
+                await asyncio.to_thread(self._dead_letter, row_id, str(error.get("errmsg")))
+            return error["index"]
+        except Exception as e:
+            if len(rows) > 1:
+                # Replay is idempotent, so retry one entry at a time to find the one that fails
+                applied = 0
+                for row in rows:
+                    applied += await self._replay(collection_name, [row])
+                return applied
+            row_id = rows[0][0]
+            self._failures[row_id] = self._failures.get(row_id, 0) + 1
+            if self._failures[row_id] < settings.JOURNAL_MAX_ATTEMPTS:
+                raise
+            logger.error(f"❌ Journaled write to {collection_name} kept failing, moved to dead_writes: {e}")
+            await asyncio.to_thread(self._dead_letter, row_id, f"{type(e).__name__}: {e}")
+            return 0
+
+        await asyncio.to_thread(self._delete_through, rows[-1][0])
+        for row_id, _ in rows:
+            self._failures.pop(row_id, None)
+        return len(rows)
+
+    async def _without_stored_inserts(self, collection, rows: List[Tuple[int, dict]]) -> List[Tuple[int, dict]]:
+        """Rows minus inserts whose document is already stored (replayed before a crash)"""
+        documents = [entry["document"] for _, entry in rows if entry["op"] == "insert_one"]
+        if not documents:
+            return rows
+        query = {"_id": {"$in": [document["_id"] for document in documents if "_id" in document]}}
+        if all("user_id" in document for document in documents):
+            # Time-series collections are indexed on (user_id, _id)
+            query["user_id"] = {"$in": list({document["user_id"] for document in documents})}
+        stored = {doc["_id"] async for doc in collection.find(query, {"_id": 1})}
+        return [
+            (row_id, entry) for row_id, entry in rows
+            if entry["op"] != "insert_one" or entry["document"].get("_id") not in stored
+        ]
+
+    async def _already_applied(self, collection, entry: dict, row_id: int) -> bool:
+        """Whether a duplicate key error means the entry was applied by an earlier replay"""
+        if entry["op"] == "insert_one":
+            # Ids are generated before journaling, so the stored document is this one
+            return True
+        if _tagged(entry):
+            return await collection.find_one({**entry["filter"], APPLIED_FIELD: self._op_id(row_id)}, {"_id": 1}) is not None
+        return False
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+journal = WriteJournal(settings.JOURNAL_PATH)
+
+async def writable_collection(collection_name: str):
+    """
+    Collection for a direct write, or None when the write has to go through the
+    journal (database offline, or older journaled writes not yet replayed).
+    """
+    collection = await get_collection(collection_name)
+    if collection is None or await journal.has_pending():
+        return None
+    return collection
+
+async def write_or_journal(collection_name: str, operations: List[dict], ordered: bool = True) -> bool:
+    """
+    Apply operations to MongoDB in a single bulk_write, or journal them if the
+    database is unreachable. Returns True when the write reached MongoDB.
+    Pass ordered=False for independent operations (replay is always in order).
+
+    While older writes are still waiting for replay, new ones are journaled
+    behind them so an update can never overtake the insert it depends on.
+    """
+    collection = await writable_collection(collection_name)
+    if collection is not None:
+        try:
+            await collection.bulk_write([to_write_model(op) for op in operations], ordered=ordered)
+            return True
+        except ConnectionFailure as e:
+            logger.warning(f"⚠️ Write to {collection_name} failed ({e}), journaling for replay")
+            db.is_connected = False
+
+    await journal.append(collection_name, operations)
+    return False
+
+async def run_journal_flusher():
+    """Background task: reconnect when offline and replay the journal"""
+    while True:
+        await asyncio.sleep(settings.JOURNAL_FLUSH_INTERVAL_SECONDS)
+        try:
+            if await journal.pending_count() == 0:
+                continue
+            if not db.is_connected:
+                await connect_to_mongo()
+                if not db.is_connected:
+                    continue
+            replayed = await journal.flush(settings.JOURNAL_BATCH_SIZE)
+            if replayed:
+                logger.info(f"✅ Replayed {replayed} journaled writes to MongoDB")
+        except ConnectionFailure as e:
+            db.is_connected = False
+            logger.warning(f"⚠️ Journal replay interrupted, will retry: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Journal replay failed: {type(e).__name__}: {e}")
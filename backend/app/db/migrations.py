@@ -0,0 +1,139 @@
+# Data migrations
+"""
+Numbered data migrations with a resumable checkpoint.
+
+A migration names a collection, a filter matching the documents that still
+need it, and a function turning a batch of those documents into write
+operations. run_migration() walks the matching documents in _id order, one
+batch per round trip, and writes each batch with one unordered bulk_write. After
+every batch it records the last _id in the migrations collection, so an
+interrupted run resumes where it stopped. Throughput is capped at a
+documents-per-second rate, so a large backfill can run alongside normal
+traffic. Migrations are defined in app/migrations and run with
+scripts/migrate.py.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_COLLECTION = "migrations"
+
+class Migration(NamedTuple):
+    number: int
+    name: str
+    collection: str
+    # Documents still to migrate; migrated documents should stop matching it
+    filter: Dict[str, Any]
+    # Write operations for a batch of matching documents (empty to skip them)
+    apply: Callable[[List[dict]], List[Any]]
+    projection: Optional[Dict[str, Any]] = None
+
+class MigrationResult(NamedTuple):
+    scanned: int
+    written: int
+    failed: int
+
+_migrations: Dict[int, Migration] = {}
+
+def register_migration(migration: Migration):
+    """Register a migration; numbers are unique and fix the order migrations run in"""
+    existing = _migrations.get(migration.number)
+    if existing is not None and existing.name != migration.name:
+        raise ValueError(f"Migration {migration.number} is already registered as {existing.name}")
+    _migrations[migration.number] = migration
+
+def registered_migrations() -> List[Migration]:
+    return [_migrations[number] for number in sorted(_migrations)]
+
+async def read_checkpoints(database) -> Dict[int, dict]:
+    """Checkpoint document of every migration that has started, by number"""
+    cursor = database[CHECKPOINT_COLLECTION].find({})
+    return {doc["_id"]: doc async for doc in cursor}
+
+async def run_migration(
+    database,
+    migration: Migration,
+    batch_size: int,
+    rate: float,
+    dry_run: bool = False,
+    restart: bool = False
+) -> MigrationResult:
+    """
+    Run one migration from its checkpoint (or from the start with restart)
+    and mark it done. At most rate documents are processed per second. A dry
+    run reads and converts every batch but writes neither the documents nor
+    the checkpoint.
+    """
+    checkpoints = database[CHECKPOINT_COLLECTION]
+    collection = database[migration.collection]
+
+    checkpoint = None if restart else await checkpoints.find_one({"_id": migration.number})
+    last_id = checkpoint.get("last_id") if checkpoint else None
+    if not dry_run:
+        now = datetime.utcnow()
+        fields = {"name": migration.name, "status": "running", "updated_at": now}
+        if restart:
+            fields.update(last_id=None, scanned=0, failed=0)
+        await checkpoints.update_one(
+            {"_id": migration.number},
+            {"$set": fields, "$setOnInsert": {"started_at": now}},
+            upsert=True
+        )
+
+    scanned = written = failed = 0
+    while True:
+        started = time.monotonic()
+        query = dict(migration.filter)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        cursor = collection.find(query, migration.projection).sort("_id", 1).limit(batch_size)
+        batch = await cursor.to_list(length=batch_size)
+        if not batch:
+            break
+
+        operations = migration.apply(batch)
+        batch_failed = 0
+        if operations and not dry_run:
+            try:
+                result = await collection.bulk_write(operations, ordered=False)
+                written += result.modified_count + result.deleted_count + result.inserted_count
+            except BulkWriteError as e:
+                # Writes that failed (e.g. on a unique index) are reported and
+                # left in place; the rest of the batch was applied
+                details = e.details
+                written += details.get("nModified", 0) + details.get("nRemoved", 0) + details.get("nInserted", 0)
+                batch_failed = len(details.get("writeErrors", []))
+                for error in details.get("writeErrors", [])[:5]:
+                    logger.warning(f"⚠️ {migration.name}: {error.get('errmsg')}")
+        elif dry_run:
+            written += len(operations)
+        failed += batch_failed
+
+        scanned += len(batch)
+        last_id = batch[-1]["_id"]
+        if not dry_run:
+            await checkpoints.update_one(
+                {"_id": migration.number},
+                {
+                    "$set": {"last_id": last_id, "updated_at": datetime.utcnow()},
+                    "$inc": {"scanned": len(batch), "failed": batch_failed}
+                }
+            )
+        logger.info(f"{migration.name}: {scanned} documents scanned")
+
+        # Throttle to the configured rate
+        await asyncio.sleep(max(0.0, len(batch) / rate - (time.monotonic() - started)))
+
+    if not dry_run:
+        await checkpoints.update_one(
+            {"_id": migration.number},
+            {"$set": {"status": "done", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+        )
+    return MigrationResult(scanned, written, failed)
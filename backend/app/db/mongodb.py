@@ -1,20 +1,30 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
+from fastapi import HTTPException, status
 import logging
 import certifi
 import ssl
+import time
 
 logger = logging.getLogger(__name__)
 
+# Minimum gap between inline reconnect attempts while offline, so requests
+# don't each pay the server selection timeout during an outage
+RECONNECT_INTERVAL_SECONDS = 30
+
 class Database:
     def __init__(self):
         self.client = None
         self.is_connected = False
+        self.last_connect_attempt = 0.0
     
 db = Database()
 
 async def connect_to_mongo():
     """Connect to MongoDB with enhanced SSL/TLS support and performance optimizations"""
+    db.last_connect_attempt = time.monotonic()
+    if db.client:
+        db.client.close()
     try:
         # ✅ OPTIMIZATION: MongoDB connection with connection pooling and fast settings
         # Use certifi for SSL certificate verification (fixes Windows SSL issues)
@@ -55,7 +65,7 @@ async def connect_to_mongo():
             logger.error("   2. Go to: Network Access → Add IP Address → Add Current IP")
             logger.error("   3. Or allow access from anywhere: 0.0.0.0/0 (dev only)")
         
-        logger.warning("⚠️ Running in offline mode - sessions will not be persisted")
+        logger.warning("⚠️ Running in offline mode - writes will be journaled locally until the database is reachable")
 
 async def close_mongo_connection():
     """Close MongoDB connection"""
@@ -67,8 +77,8 @@ async def get_database():
     """Get database instance"""
     if db.client and db.is_connected:
         return db.client[settings.DATABASE_NAME]
-    # If not connected, try to connect
-    if not db.is_connected:
+    # If not connected, try to connect (throttled - the journal flusher keeps retrying in the background)
+    if not db.is_connected and time.monotonic() - db.last_connect_attempt >= RECONNECT_INTERVAL_SECONDS:
         await connect_to_mongo()
         if db.client and db.is_connected:
             return db.client[settings.DATABASE_NAME]
@@ -81,6 +91,16 @@ async def get_collection(collection_name: str):
         return database[collection_name]
     return None
 
+async def require_collection(collection_name: str):
+    """Get collection from database, failing with 503 when offline"""
+    collection = await get_collection(collection_name)
+    if collection is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database connection not available"
+        )
+    return collection
+
 def is_db_connected():
     """Check if database is connected"""
     return db.is_connected
@@ -0,0 +1,200 @@
+# Session write buffer
+"""
+In-process write buffer for high-frequency session updates.
+
+The exercise page PUTs to /api/sessions/{id} repeatedly during a workout. The
+buffer keeps the latest known state of each active session, merges updates
+into it and writes all pending changes for all sessions as one bulk_write at
+the end of a short window. Responses are built from the buffered state, so an
+update to a session the buffer already knows costs no database round trip.
+
+Each entry also remembers what the session has already contributed to its
+daily rollup and the user's stats document, so a flush writes the $inc deltas
+for both in the same pass.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.journal import write_or_journal, journal_update
+from app.repositories import rollups as rollups_repo, stats as stats_repo
+
+logger = logging.getLogger(__name__)
+
+class BufferedSession:
+    """Latest known state of a session plus the fields not yet written"""
+
+    def __init__(self, state: dict, accounted: dict, collection: str):
+        self.state = state
+        # sessions or session_series (see app.repositories.sessions)
+        self.collection = collection
+        self.dirty: Dict[str, object] = {}
+        # Metrics of this session already counted in daily_rollups and user_stats
+        self.accounted = accounted
+        self.touched_at = time.monotonic()
+
+    def rollup_delta(self) -> dict:
+        return rollups_repo.metrics_delta(rollups_repo.session_metrics(self.state), self.accounted)
+
+    def pending(self) -> bool:
+        return bool(self.dirty) or bool(self.rollup_delta())
+
+class SessionWriteBuffer:
+    def __init__(self, window_seconds: float, max_entries: int, idle_seconds: float):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self._entries: "OrderedDict[str, BufferedSession]" = OrderedDict()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        """Buffered state of a session, or None if it has to be read from MongoDB"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        if not entry.pending() and time.monotonic() - entry.touched_at > self.idle_seconds:
+            # Another worker may have written since; re-read rather than serve stale state
+            del self._entries[session_id]
+            return None
+        self._entries.move_to_end(session_id)
+        return entry.state
+
+    def seed(self, session: dict, collection: str, accounted: Optional[dict] = None):
+        """
+        Start tracking a session from a freshly read or inserted document in collection.
+        accounted is what daily_rollups already holds for it (default: the
+        session as given); anything else is added by the next flush.
+        """
+        session_id = str(session["_id"])
+        if accounted is None:
+            accounted = rollups_repo.session_metrics(session)
+        entry = BufferedSession(dict(session), accounted, collection)
+        self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        self._evict()
+        if entry.pending():
+            self._schedule_flush()
+
+    async def remove(self, deleted: dict):
+        """
+        Stop tracking a deleted session, dropping any unwritten changes, and take
+        back what it had contributed to daily_rollups and user_stats.
+        """
+        # Hold the lock so an in-flight flush can't add a delta after this subtracts
+        async with self._flush_lock:
+            entry = self._entries.pop(str(deleted["_id"]), None)
+            counted = entry.accounted if entry is not None else rollups_repo.session_metrics(deleted)
+            delta = {metric: -value for metric, value in counted.items() if value}
+            if delta:
+                await apply_session_deltas([(deleted, delta)])
+
+    async def update(self, session_id: str, fields: dict, flush_now: bool = False) -> dict:
+        """
+        Merge fields into the buffered session and schedule a flush.
+        The session must have been seeded first. Returns the merged state.
+        """
+        entry = self._entries[session_id]
+        entry.state.update(fields)
+        entry.dirty.update(fields)
+        entry.touched_at = time.monotonic()
+        self._entries.move_to_end(session_id)
+
+        if flush_now:
+            await self.flush()
+        else:
+            self._schedule_flush()
+        return entry.state
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window_seconds)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"❌ Session buffer flush failed: {type(e).__name__}: {e}")
+
+    async def flush(self):
+        """Write every pending session change in one bulk_write per collection, then the metric deltas"""
+        async with self._flush_lock:
+            pending = {
+                session_id: entry
+                for session_id, entry in self._entries.items()
+                if entry.pending()
+            }
+            if not pending:
+                return
+
+            operations: Dict[str, List[dict]] = {}
+            deltas = []
+            for entry in pending.values():
+                if entry.dirty:
+                    operations.setdefault(entry.collection, []).append(journal_update(
+                        {"_id": entry.state["_id"], "user_id": entry.state["user_id"]},
+                        {"$set": entry.dirty}
+                    ))
+                delta = entry.rollup_delta()
+                if delta:
+                    deltas.append((entry.state, delta))
+            snapshots = {session_id: entry.dirty for session_id, entry in pending.items()}
+            counted = {session_id: rollups_repo.session_metrics(entry.state) for session_id, entry in pending.items()}
+            for entry in pending.values():
+                entry.dirty = {}
+
+            try:
+                for collection_name, collection_operations in operations.items():
+                    await write_or_journal(collection_name, collection_operations)
+            except Exception:
+                # Put the changes back underneath anything merged while writing
+                for session_id, dirty in snapshots.items():
+                    entry = self._entries.get(session_id)
+                    if entry is not None:
+                        entry.dirty = {**dirty, **entry.dirty}
+                raise
+
+            # A failure here leaves accounted unchanged, so the next flush retries the deltas
+            await apply_session_deltas(deltas)
+            for session_id, entry in pending.items():
+                entry.accounted = counted[session_id]
+
+            updated = sum(len(collection_operations) for collection_operations in operations.values())
+            logger.debug(f"Flushed {updated} buffered session updates and {len(deltas)} metric deltas")
+
+    def _evict(self):
+        """Drop least recently used clean entries beyond max_entries"""
+        if len(self._entries) <= self.max_entries:
+            return
+        for session_id in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if not self._entries[session_id].pending():
+                del self._entries[session_id]
+
+async def apply_session_deltas(deltas: List[Tuple[dict, dict]]):
+    """
+    Apply (session, metrics delta) pairs to daily_rollups and user_stats,
+    one bulk_write per collection (journaled while offline)
+    """
+    if not deltas:
+        return
+    await write_or_journal("daily_rollups", [
+        rollups_repo.rollup_update(session, delta) for session, delta in deltas
+    ])
+    await write_or_journal("user_stats", stats_repo.stats_updates(
+        [(session["user_id"], delta) for session, delta in deltas]
+    ))
+    for user_id in {session["user_id"] for session, _ in deltas}:
+        await stats_repo.stats_cache.invalidate(user_id)
+
+session_buffer = SessionWriteBuffer(
+    window_seconds=settings.SESSION_BUFFER_WINDOW_SECONDS,
+    max_entries=settings.SESSION_BUFFER_MAX_ENTRIES,
+    idle_seconds=settings.SESSION_BUFFER_IDLE_SECONDS
+)
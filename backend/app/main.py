@@ -1,13 +1,27 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from pymongo.errors import DuplicateKeyError
 from app.core.config import settings
-from app.api.routes import auth, exercises, sessions, users, goals
-from app.db.mongodb import connect_to_mongo, close_mongo_connection
+from app.api.routes import auth, exercises, sessions, users, goals, dashboard
+from app.db.mongodb import connect_to_mongo, close_mongo_connection, is_db_connected, get_database
+from app.db.indexes import ensure_indexes
+from app.core.google_certs import run_cert_refresher
+from app.db.journal import journal, run_journal_flusher
+from app.db.write_buffer import session_buffer
+from app.repositories.goals import run_goal_expiry
+from app.repositories.exercises import run_catalog_refresher
+from app.utils.cache import cache_metrics
+from app.models.common import HealthResponse, ServiceInfo
+from app.utils.serialization import BSONJSONResponse
+from app.core import rate_limit
+import asyncio
 
 app = FastAPI(
     title="FitDetect API",
     description="AI-powered fitness tracking API with real-time exercise detection",
-    version="1.0.0"
+    version="1.0.0",
+    # ✅ OPTIMIZATION: orjson rendering for every response
+    default_response_class=BSONJSONResponse
 )
 
 # CORS middleware
@@ -17,18 +31,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "X-Next-Cursor"],
 )
 
+@app.exception_handler(DuplicateKeyError)
+async def duplicate_key_handler(request: Request, exc: DuplicateKeyError):
+    """Writes rejected by a unique index are client errors, not server errors"""
+    return BSONJSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"detail": "A record with the same unique key already exists"}
+    )
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_db_client():
     """Initialize database connection on startup"""
     await connect_to_mongo()
+    # Apply the indexes declared by the repositories (no-op when they already exist)
+    database = await get_database()
+    if database is not None:
+        await ensure_indexes(database)
+    # Replay writes journaled while the database was unreachable
+    app.state.journal_flusher = asyncio.create_task(run_journal_flusher())
+    # Keep goal status current so stats can count missed goals directly
+    app.state.goal_expiry = asyncio.create_task(run_goal_expiry())
+    # Fetch Google's signing certificates ahead of the first login
+    app.state.cert_refresher = asyncio.create_task(run_cert_refresher())
+    # Load the exercise catalog into memory and keep it current
+    app.state.catalog_refresher = asyncio.create_task(run_catalog_refresher())
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close database connection on shutdown"""
+    app.state.journal_flusher.cancel()
+    app.state.goal_expiry.cancel()
+    app.state.cert_refresher.cancel()
+    app.state.catalog_refresher.cancel()
+    # Don't lose session updates still waiting in the buffer window
+    await session_buffer.flush()
     await close_mongo_connection()
+    journal.close()
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -36,8 +78,9 @@ app.include_router(users.router, prefix="/api/users", tags=["Users"])
 app.include_router(exercises.router, prefix="/api/exercises", tags=["Exercises"])
 app.include_router(sessions.router, prefix="/api/sessions", tags=["Sessions"])
 app.include_router(goals.router, prefix="/api", tags=["Goals"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
 
-@app.get("/")
+@app.get("/", response_model=ServiceInfo)
 async def root():
     """Health check endpoint"""
     return {
@@ -46,7 +89,7 @@ async def root():
         "version": "1.0.0"
     }
 
-@app.get("/api/health")
+@app.get("/api/health", response_model=HealthResponse)
 async def health_check():
     """Detailed health check"""
     return {
@@ -54,8 +97,16 @@ async def health_check():
         "environment": settings.ENVIRONMENT,
         "services": {
             "api": "operational",
-            "database": "operational",
+            "database": "operational" if is_db_connected() else "offline",
             "detection": "operational"
+        },
+        "journal": {
+            "pending_writes": await journal.pending_count(),
+            "dead_letters": await journal.dead_letter_count()
+        },
+        "caches": cache_metrics(),
+        "rate_limit": {
+            "throttled_requests": rate_limit.throttled_requests
         }
     }
 
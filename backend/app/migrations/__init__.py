@@ -0,0 +1,2 @@
+# Data migrations, registered in order on import (run with scripts/migrate.py)
+from app.migrations import goal_dates, session_timestamps  # noqa: F401
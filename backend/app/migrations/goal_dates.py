@@ -0,0 +1,26 @@
+# Migration 1: goal dates from ISO strings to native dates
+from pymongo import UpdateOne
+
+from app.db.migrations import Migration, register_migration
+from app.repositories.goals import stored_date
+
+def convert(batch):
+    operations = []
+    for goal in batch:
+        try:
+            native = stored_date(goal["date"])
+        except ValueError:
+            # Malformed dates are left for a manual fix
+            continue
+        # Matching the old value leaves a goal changed since it was read alone
+        operations.append(UpdateOne({"_id": goal["_id"], "date": goal["date"]}, {"$set": {"date": native}}))
+    return operations
+
+register_migration(Migration(
+    number=1,
+    name="goal_dates_to_native",
+    collection="goals",
+    filter={"date": {"$type": "string"}},
+    apply=convert,
+    projection={"date": 1}
+))
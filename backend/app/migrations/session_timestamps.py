@@ -0,0 +1,24 @@
+# Migration 2: timestamp for sessions written before the field existed
+from pymongo import UpdateOne
+
+from app.db.migrations import Migration, register_migration
+from app.repositories.sessions import LEGACY_COLLECTION
+
+def backfill(batch):
+    return [
+        UpdateOne(
+            {"_id": session["_id"], "timestamp": {"$exists": False}},
+            {"$set": {"timestamp": session.get("created_at") or session["_id"].generation_time.replace(tzinfo=None)}}
+        )
+        for session in batch
+    ]
+
+# Time-series sessions always have a timestamp (it is their timeField)
+register_migration(Migration(
+    number=2,
+    name="session_timestamps",
+    collection=LEGACY_COLLECTION,
+    filter={"timestamp": {"$exists": False}},
+    apply=backfill,
+    projection={"created_at": 1}
+))
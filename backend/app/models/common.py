@@ -0,0 +1,39 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+class MessageResponse(BaseModel):
+    """Confirmation returned by endpoints that have nothing else to report"""
+    message: str
+
+class ServiceInfo(BaseModel):
+    """Response of the root endpoint"""
+    status: str
+    message: str
+    version: str
+
+class ServiceStatus(BaseModel):
+    api: str
+    database: str  # "operational" or "offline"
+    detection: str
+
+class JournalStatus(BaseModel):
+    pending_writes: int  # Offline writes waiting to be replayed
+    dead_letters: int  # Journaled writes given up on after failing to replay
+
+class CacheMetrics(BaseModel):
+    hits: int
+    misses: int
+    invalidations: int
+    entries: Optional[int] = None  # Process-local caches only
+
+class RateLimitStatus(BaseModel):
+    throttled_requests: int
+
+class HealthResponse(BaseModel):
+    """Detailed health of this worker"""
+    status: str
+    environment: str
+    services: ServiceStatus
+    journal: JournalStatus
+    caches: Dict[str, CacheMetrics]  # By namespace
+    rate_limit: RateLimitStatus
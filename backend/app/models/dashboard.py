@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from app.models.goal import GoalResponse, GoalStats
+from app.models.session import SessionHistoryItem
+from app.models.user import UserProfile, UserStats
+
+class Dashboard(BaseModel):
+    """
+    Everything the dashboard page shows, in one response. A section that
+    failed or timed out is null and named in errors.
+    """
+    profile: Optional[UserProfile] = None
+    stats: Optional[UserStats] = None
+    recent_sessions: Optional[List[SessionHistoryItem]] = None
+    today_goals: Optional[List[GoalResponse]] = None
+    goal_stats: Optional[GoalStats] = None
+    errors: List[str] = []
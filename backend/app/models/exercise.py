@@ -2,7 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
-from app.models.user import PyObjectId
+from app.models.user import PyObjectId, ObjectIdStr
 
 class Exercise(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -29,3 +29,16 @@ class ExerciseUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     detection_params: Optional[Dict[str, Any]] = None
+
+class ExerciseResponse(BaseModel):
+    """Response schema for an exercise catalog entry"""
+    id: ObjectIdStr = Field(alias="_id")
+    exercise_id: str
+    name: str
+    type: str
+    description: Optional[str] = None
+    detection_params: Dict[str, Any] = {}
+    created_at: Optional[datetime] = None
+
+    class Config:
+        populate_by_name = True
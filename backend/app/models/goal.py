@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, AliasChoices, model_validator
 from typing import Optional, Literal
 from datetime import datetime, date
+from app.models.user import ObjectIdStr, IsoDateStr
 
 class ExerciseGoal(BaseModel):
     """Exercise goal for a specific date"""
@@ -32,17 +33,35 @@ class GoalUpdate(BaseModel):
     status: Optional[Literal["pending", "in_progress", "completed", "missed"]] = None
 
 class GoalResponse(BaseModel):
-    """Response schema for goal"""
-    id: str
+    """Response schema for goal, decoded directly from a goal document"""
+    id: ObjectIdStr = Field(validation_alias=AliasChoices("id", "_id"))
     user_id: str
     exercise_type: str
     target_count: int
-    date: str
+    date: IsoDateStr
     completed_count: int
     status: str
     progress_percentage: int
-    created_at: str
-    updated_at: str
+    created_at: IsoDateStr
+    updated_at: IsoDateStr
+
+    @model_validator(mode="before")
+    @classmethod
+    def compute_progress(cls, data):
+        if isinstance(data, dict) and "progress_percentage" not in data:
+            target = data.get("target_count") or 0
+            completed = data.get("completed_count", 0)
+            data = {**data, "progress_percentage": int((completed / target) * 100) if target > 0 else 0}
+        return data
+
+class GoalStats(BaseModel):
+    """Goal counts per status for the current user"""
+    total_goals: int
+    completed_goals: int
+    pending_goals: int
+    in_progress_goals: int
+    missed_goals: int
+    completion_rate: float  # percent
 
 class BulkGoalCreate(BaseModel):
     """Schema for creating multiple goals at once"""
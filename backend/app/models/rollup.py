@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import List
+
+class DailyRollup(BaseModel):
+    """Pre-summed activity for one user, day and exercise"""
+    date: str  # "YYYY-MM-DD" (UTC day the session was created)
+    exercise_type: str
+    reps: int = 0
+    duration: float = 0
+    calories: float = 0
+    session_count: int = 0
+
+class ActivitySummary(BaseModel):
+    """Daily rollups in a date range plus the current streak of active days"""
+    days: List[DailyRollup]
+    current_streak: int
@@ -1,8 +1,9 @@
-from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List
+from datetime import datetime, timezone
 from bson import ObjectId
-from app.models.user import PyObjectId
+from app.models.user import PyObjectId, ObjectIdStr
+from app.models.goal import GoalResponse
 
 class Session(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -37,6 +38,44 @@ class SessionCreate(BaseModel):
     exercise_name: str
     exercise_type: str
 
+class SessionCreated(BaseModel):
+    session_id: str
+    exercise_name: str
+    exercise_type: str
+    reps: int
+    completed: bool
+
+class OfflineSession(BaseModel):
+    """A completed session recorded on a client while offline"""
+    id: str = Field(description="Client-generated ObjectId (24 hex characters); resending it is a no-op")
+    exercise_name: str
+    exercise_type: str
+    reps: int = Field(ge=0)
+    duration: float = Field(ge=0)  # in seconds
+    timestamp: datetime  # when the session was performed
+
+    @field_validator("id")
+    @classmethod
+    def check_object_id(cls, v: str) -> str:
+        if not ObjectId.is_valid(v):
+            raise ValueError("id must be a 24 character hex ObjectId")
+        return v
+
+    @field_validator("timestamp")
+    @classmethod
+    def to_naive_utc(cls, v: datetime) -> datetime:
+        # Stored like every other timestamp: naive UTC
+        return v.astimezone(timezone.utc).replace(tzinfo=None) if v.tzinfo else v
+
+class BulkSessionIngest(BaseModel):
+    sessions: List[OfflineSession] = Field(min_length=1, max_length=500)
+
+class BulkSessionResult(BaseModel):
+    inserted: int
+    duplicates: int  # Already stored by an earlier upload of the same batch, or repeated in it
+    rejected: List[str] = []  # Ids that belong to another user
+    failed: List[str] = []  # Ids the database could not store; safe to resend
+
 class SessionUpdate(BaseModel):
     reps: Optional[int] = None
     duration: Optional[float] = None
@@ -45,3 +84,40 @@ class SessionUpdate(BaseModel):
 
 class SessionInDB(Session):
     pass
+
+class SessionResponse(BaseModel):
+    """Response schema for a session, decoded directly from the projected document"""
+    id: ObjectIdStr = Field(alias="_id")
+    user_id: Optional[str] = None
+    exercise_name: Optional[str] = None
+    exercise_type: Optional[str] = None
+    reps: Optional[int] = None
+    duration: Optional[float] = None
+    calories_burned: Optional[float] = None
+    completed: Optional[bool] = None
+    timestamp: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    # Today's goal for the exercise, when completing the session advanced it
+    goal: Optional[GoalResponse] = None
+
+    class Config:
+        populate_by_name = True
+
+class SessionHistoryItem(BaseModel):
+    """Response schema for an entry in the user's exercise history"""
+    id: ObjectIdStr = Field(alias="_id")
+    exercise_name: str
+    exercise_type: str
+    reps: int = 0
+    duration: Optional[float] = None
+    calories_burned: Optional[float] = None
+    completed: bool = False
+    timestamp: Optional[datetime] = None
+
+    class Config:
+        populate_by_name = True
+
+class SessionHistory(BaseModel):
+    sessions: List[SessionHistoryItem]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, Annotated
-from datetime import datetime
+from pydantic import BaseModel, Field, EmailStr, BeforeValidator
+from typing import List, Optional, Annotated
+from datetime import datetime, date
 from bson import ObjectId
 from pydantic import GetJsonSchemaHandler
 from pydantic.json_schema import JsonSchemaValue
@@ -28,6 +28,12 @@ class PyObjectId(ObjectId):
     ) -> JsonSchemaValue:
         return {"type": "string"}
 
+# ObjectId (or anything else) decoded straight from a document into its string form
+ObjectIdStr = Annotated[str, BeforeValidator(str)]
+
+# date/datetime values rendered as ISO strings, for models that expose them as text
+IsoDateStr = Annotated[str, BeforeValidator(lambda v: v.isoformat() if isinstance(v, (date, datetime)) else v)]
+
 class User(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
     user_id: str
@@ -57,3 +63,60 @@ class UserUpdate(BaseModel):
 
 class UserInDB(User):
     pass
+
+class UserProfile(BaseModel):
+    """Response schema for the current user's profile"""
+    id: ObjectIdStr = Field(alias="_id")
+    user_id: str
+    name: Optional[str] = None
+    email: Optional[str] = None
+    picture: Optional[str] = None
+    avatar: Optional[str] = None
+    avatar_selected: bool = False
+    created_at: Optional[datetime] = None
+    last_login: Optional[datetime] = None
+
+    class Config:
+        populate_by_name = True
+
+class AvatarStatus(BaseModel):
+    """Response schema for the current user's avatar"""
+    avatar: Optional[str] = None
+    avatar_selected: bool = False
+
+class Avatar(BaseModel):
+    id: str
+    name: str
+    gender: str
+    category: str
+
+class AvatarList(BaseModel):
+    avatars: List[Avatar]
+    total: int
+
+class AvatarSelection(BaseModel):
+    success: bool
+    avatar: str
+    message: str
+
+class UserStats(BaseModel):
+    """Lifetime totals of the current user's sessions"""
+    total_sessions: int
+    total_reps: int
+    total_duration: float
+
+class AuthUser(BaseModel):
+    """The signed-in user, as returned by the auth endpoints"""
+    user_id: str
+    name: Optional[str] = None
+    email: Optional[str] = None
+    picture: Optional[str] = None
+
+class TokenResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int  # seconds
+    refresh_token: str
+
+class AuthResponse(TokenResponse):
+    user: AuthUser
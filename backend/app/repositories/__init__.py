@@ -0,0 +1,6 @@
+# Repository layer
+"""
+One module per MongoDB collection. Repositories own the queries, send field
+projections so only returned fields cross the wire, and decode documents
+straight into response models.
+"""
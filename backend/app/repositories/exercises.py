@@ -0,0 +1,115 @@
+# Exercises repository
+"""
+The exercise catalog changes about once a release, so it is served from an
+immutable in-memory snapshot indexed by exercise_id and type. The snapshot
+is loaded at startup and reloaded after this worker creates or deletes an
+exercise. Those writes also bump a version document, which every worker
+polls (one point read) so it picks up catalog changes made elsewhere.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.db.indexes import declare_index, declare_query
+from app.db.mongodb import require_collection
+from app.models.exercise import ExerciseResponse
+from app.utils.etag import weak_etag
+
+logger = logging.getLogger(__name__)
+
+EXERCISE_PROJECTION = {
+    "exercise_id": 1,
+    "name": 1,
+    "type": 1,
+    "description": 1,
+    "detection_params": 1,
+    "created_at": 1,
+}
+
+VERSION_COLLECTION = "catalog_versions"
+VERSION_ID = "exercises"
+
+declare_index("exercises", [("exercise_id", 1)], unique=True)
+
+# The catalog is loaded in exercise_id order so the read walks the unique index
+declare_query("exercises", "load_catalog", {}, sort=[("exercise_id", 1)])
+
+class ExerciseCatalog(NamedTuple):
+    version: int
+    exercises: Tuple[ExerciseResponse, ...]  # exercise_id order
+    by_id: Mapping[str, ExerciseResponse]
+    by_type: Mapping[str, Tuple[ExerciseResponse, ...]]
+    etag: str
+
+_catalog: Optional[ExerciseCatalog] = None
+
+async def _read_version() -> int:
+    versions = await require_collection(VERSION_COLLECTION)
+    doc = await versions.find_one({"_id": VERSION_ID}, {"version": 1})
+    return doc["version"] if doc else 0
+
+async def load_catalog() -> ExerciseCatalog:
+    """Read the whole catalog and swap it in as the current snapshot"""
+    global _catalog
+    # The version is read first: a write landing in between bumps it again,
+    # so the next check reloads rather than keeping a stale snapshot
+    version = await _read_version()
+    exercises = await require_collection("exercises")
+    cursor = exercises.find({}, EXERCISE_PROJECTION).sort("exercise_id", 1)
+    entries = tuple([ExerciseResponse.model_validate(doc) async for doc in cursor])
+
+    by_type = defaultdict(list)
+    for exercise in entries:
+        by_type[exercise.type].append(exercise)
+    _catalog = ExerciseCatalog(
+        version=version,
+        exercises=entries,
+        by_id=MappingProxyType({exercise.exercise_id: exercise for exercise in entries}),
+        by_type=MappingProxyType({key: tuple(value) for key, value in by_type.items()}),
+        etag=weak_etag([exercise.model_dump() for exercise in entries])
+    )
+    return _catalog
+
+async def get_catalog() -> ExerciseCatalog:
+    """The current snapshot, loading it first if startup could not"""
+    return _catalog if _catalog is not None else await load_catalog()
+
+async def bump_catalog_version():
+    """Tell every worker the catalog changed (call after writing exercises directly)"""
+    versions = await require_collection(VERSION_COLLECTION)
+    await versions.update_one({"_id": VERSION_ID}, {"$inc": {"version": 1}}, upsert=True)
+
+async def _catalog_changed():
+    await bump_catalog_version()
+    await load_catalog()
+
+async def insert_exercise(exercise: dict) -> ExerciseResponse:
+    exercises = await require_collection("exercises")
+    result = await exercises.insert_one(exercise)
+    await _catalog_changed()
+    return ExerciseResponse.model_validate({**exercise, "_id": result.inserted_id})
+
+async def delete_exercise(exercise_id: str) -> bool:
+    exercises = await require_collection("exercises")
+    result = await exercises.delete_one({"exercise_id": exercise_id})
+    if result.deleted_count == 0:
+        return False
+    await _catalog_changed()
+    return True
+
+async def run_catalog_refresher():
+    """Background task: load the catalog, then reload it whenever its version moves"""
+    while True:
+        try:
+            if _catalog is None or await _read_version() != _catalog.version:
+                catalog = await load_catalog()
+                logger.info(f"✅ Loaded {len(catalog.exercises)} exercises (catalog version {catalog.version})")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Exercise catalog refresh failed, will retry: {type(e).__name__}: {e}")
+        await asyncio.sleep(settings.EXERCISE_CATALOG_CHECK_SECONDS)
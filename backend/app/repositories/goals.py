@@ -0,0 +1,533 @@
+# Goals repository
+import asyncio
+import calendar
+import hashlib
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.db.indexes import declare_index, declare_query
+from app.db.journal import write_or_journal, journal_update, journal_delete, writable_collection
+from app.core.config import settings
+from app.db.mongodb import get_collection, require_collection
+from app.models.goal import GoalResponse, GoalStats
+from app.utils.cache import create_cache
+
+logger = logging.getLogger(__name__)
+
+# Every GoalResponse field except the derived progress_percentage
+GOAL_PROJECTION = {
+    "user_id": 1,
+    "exercise_type": 1,
+    "target_count": 1,
+    "date": 1,
+    "completed_count": 1,
+    "status": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+# One goal per user, exercise and day; also serves lookups by that key
+declare_index("goals", [("user_id", 1), ("exercise_type", 1), ("date", 1)], unique=True)
+# Date-range reads (calendar, today, month sync), sorted by date
+declare_index("goals", [("user_id", 1), ("date", 1)])
+# Expiry scan: open goals in date order, without touching closed ones
+declare_index("goals", [("status", 1), ("date", 1)])
+
+# Goal dates are stored as native dates (midnight, naive UTC like every other
+# timestamp) so range queries compare dates, and are exchanged as ISO
+# "YYYY-MM-DD" strings everywhere outside this module. While GOAL_DATES is
+# "dual", goals still stored with string dates (before migration 1 has
+# converted them) are matched as well.
+
+def stored_date(day: str) -> datetime:
+    """Stored form of an ISO day; ValueError if it is malformed"""
+    return datetime.combine(date.fromisoformat(day), time.min)
+
+def normalize_day(day: str) -> str:
+    """
+    YYYY-MM-DD form of an ISO day; ValueError if it is malformed. fromisoformat
+    also takes "20261018" and "2026-W42-1", whose first 7 characters are not the month.
+    """
+    return date.fromisoformat(day).isoformat()
+
+def iso_day(value) -> str:
+    """ISO form of a stored goal date, whichever way it was stored"""
+    return value.date().isoformat() if isinstance(value, datetime) else value
+
+def _decoded(goal: dict) -> dict:
+    goal["date"] = iso_day(goal["date"])
+    return goal
+
+def _dual_dates() -> bool:
+    return settings.GOAL_DATES == "dual"
+
+def _on_day(day: str, dual: Optional[bool] = None):
+    """Filter value matching the goal date of an ISO day (dual defaults to the GOAL_DATES mode)"""
+    native = stored_date(day)
+    dual = _dual_dates() if dual is None else dual
+    return {"$in": [native, day]} if dual else native
+
+def _date_range(dual: Optional[bool] = None, **bounds: Optional[str]) -> dict:
+    """Filter clause for goal dates within ISO day bounds, given as gte/lte/lt"""
+    bounds = {f"${op}": day for op, day in bounds.items() if day}
+    native = {"date": {op: stored_date(day) for op, day in bounds.items()}}
+    dual = _dual_dates() if dual is None else dual
+    if not dual:
+        return native
+    return {"$or": [native, {"date": bounds}]}
+
+declare_query("goals", "get_goal", {"_id": ObjectId(), "user_id": "google_1"})
+declare_query("goals", "find_goals_by_status", {"user_id": "google_1", "status": "completed"}, sort=[("date", 1)])
+declare_query("goals", "goal_status_counts", {"user_id": "google_1"})
+declare_query("goals", "iter_goals", {"user_id": "google_1"}, sort=[("date", 1)])
+
+# Date filters are sampled as both GOAL_DATES modes build them, so the dual
+# mode's string-or-native clauses are checked as well as the native ones
+for _mode, _dual in (("native", False), ("dual", True)):
+    declare_query(
+        "goals", f"goal_by_key_{_mode}",
+        {"user_id": "google_1", "exercise_type": "pushup", "date": _on_day("2026-10-18", dual=_dual)}
+    )
+    declare_query(
+        "goals", f"find_goals_range_{_mode}",
+        {"user_id": "google_1", **_date_range(dual=_dual, gte="2026-10-01", lte="2026-10-31")},
+        sort=[("date", 1)]
+    )
+    declare_query(
+        "goals", f"find_goals_range_by_type_{_mode}",
+        {"user_id": "google_1", **_date_range(dual=_dual, gte="2026-10-01", lte="2026-10-31"), "exercise_type": "squat"},
+        sort=[("date", 1)]
+    )
+    declare_query(
+        "goals", f"expire_goals_{_mode}",
+        {"status": {"$in": ["pending", "in_progress"]}, **_date_range(dual=_dual, lt="2026-10-18")},
+        sort=[("status", 1), ("date", 1)],
+        projection={"user_id": 1, "date": 1}
+    )
+
+# Goal documents per (user_id, "YYYY-MM"): calendar, dashboard and today's-goal
+# reads are served from here; every goal write below invalidates or refreshes
+# the month it touches
+goal_cache = create_cache(
+    "goal_months",
+    max_entries=settings.GOAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.GOAL_CACHE_TTL_SECONDS
+)
+
+async def invalidate_month(user_id: str, goal_date: str):
+    """Drop the cached month containing an ISO goal date"""
+    await goal_cache.invalidate((user_id, goal_date[:7]))
+
+def month_bounds(month: str) -> Tuple[str, str]:
+    """First and last ISO dates of a "YYYY-MM" month; ValueError if it is malformed"""
+    first_day = datetime.strptime(month, "%Y-%m").date()
+    last_day = first_day.replace(day=calendar.monthrange(first_day.year, first_day.month)[1])
+    return first_day.isoformat(), last_day.isoformat()
+
+async def insert_goal(goal: dict):
+    """
+    Insert a new goal (with an ISO date) as an upsert on its (user_id,
+    exercise_type, date) key. Online, DuplicateKeyError is raised if the goal
+    already exists; offline, the upsert is journaled and replays idempotently.
+    """
+    key = {"user_id": goal["user_id"], "exercise_type": goal["exercise_type"], "date": _on_day(goal["date"])}
+    insert = {"$setOnInsert": {**goal, "date": stored_date(goal["date"])}}
+
+    goals = await writable_collection("goals")
+    if goals is not None:
+        result = await goals.update_one(key, insert, upsert=True)
+        if result.upserted_id is None:
+            raise DuplicateKeyError("Goal already exists for this exercise and date")
+    else:
+        await write_or_journal("goals", [journal_update(key, insert, upsert=True)])
+    await invalidate_month(goal["user_id"], goal["date"])
+
+async def read_month(user_id: str, month: str) -> List[dict]:
+    """Every goal document of a "YYYY-MM" month, oldest first (no limit), read from the database"""
+    goals = await require_collection("goals")
+    month_start, month_end = month_bounds(month)
+    cursor = goals.find(
+        {"user_id": user_id, **_date_range(gte=month_start, lte=month_end)},
+        GOAL_PROJECTION
+    ).sort("date", 1)
+    docs = [_decoded(doc) async for doc in cursor]
+    # Stable, and only reorders while string and native dates are mixed
+    docs.sort(key=lambda doc: doc["date"])
+    return docs
+
+async def month_for_sync(user_id: str, month: str) -> List[dict]:
+    """
+    A month's goal documents to diff a sync against: read from the database,
+    or while it is offline the cached month, so a calendar the user just
+    loaded can still be saved (503 if the month isn't cached)
+    """
+    if await get_collection("goals") is not None:
+        return await read_month(user_id, month)
+    goals = await goal_cache.get((user_id, month))
+    if goals is None:
+        await require_collection("goals")
+    return goals
+
+async def month_goals(user_id: str, month: str) -> List[dict]:
+    """A month's goal documents, oldest first, from the cache when possible"""
+    goals = await goal_cache.get((user_id, month))
+    if goals is None:
+        goals = await read_month(user_id, month)
+        await goal_cache.set((user_id, month), goals)
+    return goals
+
+async def apply_month_diff(
+    user_id: str,
+    month: str,
+    existing: List[dict],
+    desired: Dict[Tuple[str, str], int],
+    current_time: datetime,
+    delete_missing: bool = True
+) -> List[dict]:
+    """
+    Make a month's goals match desired ({(date, exercise_type): target_count})
+    with the fewest writes: goals whose target is unchanged are not touched,
+    and everything else goes out in one unordered bulk_write (nothing at all
+    if the month already matches), journaled while the database is offline.
+    Returns the resulting goal documents, oldest first, without re-reading them.
+    """
+    by_key = {(goal["date"], goal["exercise_type"]): goal for goal in existing}
+    operations = []
+    result = []
+
+    for (goal_date, exercise_type), target_count in desired.items():
+        goal = by_key.get((goal_date, exercise_type))
+        if goal is None:
+            goal = {
+                "_id": ObjectId(),
+                "user_id": user_id,
+                "exercise_type": exercise_type,
+                "date": goal_date,
+                "target_count": target_count,
+                "completed_count": 0,
+                "status": "pending",
+                "created_at": current_time,
+                "updated_at": current_time
+            }
+            # Upsert on the natural key in case another device created it meanwhile
+            operations.append(journal_update(
+                {"user_id": user_id, "exercise_type": exercise_type, "date": _on_day(goal_date)},
+                {
+                    "$set": {"target_count": target_count, "updated_at": current_time},
+                    "$setOnInsert": {
+                        **{
+                            key: value for key, value in goal.items()
+                            if key not in ("target_count", "updated_at")
+                        },
+                        "date": stored_date(goal_date)
+                    }
+                },
+                upsert=True
+            ))
+        elif goal["target_count"] != target_count:
+            goal = {**goal, "target_count": target_count, "updated_at": current_time}
+            operations.append(journal_update(
+                {"_id": goal["_id"]},
+                {"$set": {"target_count": target_count, "updated_at": current_time}}
+            ))
+        result.append(goal)
+
+    removed = [goal["_id"] for key, goal in by_key.items() if key not in desired]
+    if delete_missing and removed:
+        operations.append(journal_delete({"_id": {"$in": removed}, "user_id": user_id}))
+    elif removed:
+        result.extend(goal for key, goal in by_key.items() if key not in desired)
+
+    if operations:
+        # Every operation is keyed or filtered, so a double replay changes nothing
+        await write_or_journal("goals", operations, ordered=False)
+
+    result.sort(key=lambda goal: (goal["date"], goal["exercise_type"]))
+    # The result is the whole month, so refresh the cache in place
+    await goal_cache.set((user_id, month), result)
+    return result
+
+def goals_version(goals: List[GoalResponse]) -> str:
+    """
+    Weak ETag identifying a set of goals by content. Send the version of a
+    month's goals as If-Match when syncing it to detect changes made meanwhile.
+    """
+    content = sorted(
+        (goal.id, goal.date, goal.exercise_type, goal.target_count, goal.completed_count, goal.status)
+        for goal in goals
+    )
+    digest = hashlib.sha1(json.dumps(content).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+async def find_goals(
+    user_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    exercise_type: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 1000
+) -> List[GoalResponse]:
+    """Goals in an optional ISO date range, oldest first; ValueError for a malformed date"""
+    if start_date and end_date and start_date[:7] == end_date[:7]:
+        # ✅ OPTIMIZATION: Ranges within one month (calendar, today) come from the month cache
+        try:
+            month_bounds(start_date[:7])
+        except ValueError:
+            pass
+        else:
+            docs = [
+                doc for doc in await month_goals(user_id, start_date[:7])
+                if start_date <= doc["date"] <= end_date
+                and (not exercise_type or doc["exercise_type"] == exercise_type)
+                and (not status or doc["status"] == status)
+            ]
+            return [GoalResponse.model_validate(doc) for doc in docs[:limit]]
+
+    goals = await require_collection("goals")
+    query = {"user_id": user_id}
+
+    if start_date or end_date:
+        query.update(_date_range(gte=start_date, lte=end_date))
+
+    if exercise_type:
+        query["exercise_type"] = exercise_type
+
+    if status:
+        query["status"] = status
+
+    cursor = goals.find(query, GOAL_PROJECTION).sort("date", 1).limit(limit)
+    docs = [_decoded(doc) async for doc in cursor]
+    docs.sort(key=lambda doc: doc["date"])
+    return [GoalResponse.model_validate(doc) for doc in docs]
+
+# Columns of a goal export, in order
+EXPORT_FIELDS = [
+    "_id", "exercise_type", "date", "target_count", "completed_count",
+    "status", "created_at", "updated_at",
+]
+
+async def _decoded_stream(cursor) -> AsyncIterator[dict]:
+    async for doc in cursor:
+        yield _decoded(doc)
+
+async def iter_goals(user_id: str, batch_size: int) -> AsyncIterator[dict]:
+    """
+    Open a stream of every goal of a user, oldest first, batch_size documents
+    per round trip (the collection is checked before returning)
+    """
+    goals = await require_collection("goals")
+    projection = {field: 1 for field in EXPORT_FIELDS}
+    cursor = goals.find({"user_id": user_id}, projection).sort("date", 1)
+    cursor.batch_size(batch_size)
+    return _decoded_stream(cursor)
+
+async def get_goal(goal_id: str, user_id: str) -> Optional[GoalResponse]:
+    goals = await require_collection("goals")
+    goal = await goals.find_one({"_id": ObjectId(goal_id), "user_id": user_id}, GOAL_PROJECTION)
+    return GoalResponse.model_validate(_decoded(goal)) if goal else None
+
+# Pipeline stage deriving status from the (already updated) completed_count
+_STATUS_FROM_PROGRESS = {
+    "$set": {
+        "status": {
+            "$cond": [
+                {"$gte": ["$completed_count", "$target_count"]},
+                "completed",
+                "in_progress"
+            ]
+        }
+    }
+}
+
+async def update_goal(goal_id: str, user_id: str, fields: dict) -> Optional[GoalResponse]:
+    """
+    Apply fields and return the updated goal in one round trip. When
+    completed_count changes, status is derived from the stored target_count
+    within the same atomic pipeline update.
+    """
+    goals = await require_collection("goals")
+    pipeline = [{"$set": fields}]
+    if "completed_count" in fields:
+        pipeline.append(_STATUS_FROM_PROGRESS)
+
+    goal = await goals.find_one_and_update(
+        {"_id": ObjectId(goal_id), "user_id": user_id},
+        pipeline,
+        projection=GOAL_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    if not goal:
+        return None
+    _decoded(goal)
+    await invalidate_month(user_id, goal["date"])
+    return GoalResponse.model_validate(goal)
+
+def _progress_pipeline(reps: int) -> list:
+    return [
+        {"$set": {
+            "completed_count": {"$add": [{"$ifNull": ["$completed_count", 0]}, reps]},
+            "updated_at": datetime.utcnow()
+        }},
+        _STATUS_FROM_PROGRESS
+    ]
+
+async def record_progress_many(user_id: str, progress: List[Tuple[str, str, int]]):
+    """Add reps to several goals, given as (exercise_type, date, reps), in one unordered bulk_write"""
+    if not progress:
+        return
+    await write_or_journal("goals", [
+        journal_update(
+            {"user_id": user_id, "exercise_type": exercise_type, "date": _on_day(goal_date)},
+            _progress_pipeline(reps)
+        )
+        for exercise_type, goal_date, reps in progress
+    ], ordered=False)
+    for goal_month in {goal_date[:7] for _, goal_date, _ in progress}:
+        await goal_cache.invalidate((user_id, goal_month))
+
+async def record_progress(user_id: str, exercise_type: str, goal_date: str, reps: int) -> Optional[GoalResponse]:
+    """
+    Add reps to the user's goal for that exercise and day and recompute its
+    status, atomically on the server so concurrent devices can't lose an
+    update. Returns the updated goal, or None if there is no such goal (or the
+    database is offline, in which case the increment is journaled).
+    """
+    query = {"user_id": user_id, "exercise_type": exercise_type, "date": _on_day(goal_date)}
+    pipeline = _progress_pipeline(reps)
+
+    goals = await writable_collection("goals")
+    if goals is None:
+        await write_or_journal("goals", [journal_update(query, pipeline)])
+        await invalidate_month(user_id, goal_date)
+        return None
+
+    goal = await goals.find_one_and_update(
+        query,
+        pipeline,
+        projection=GOAL_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    await invalidate_month(user_id, goal_date)
+    return GoalResponse.model_validate(_decoded(goal)) if goal else None
+
+async def delete_goal(goal_id: str, user_id: str) -> bool:
+    goals = await require_collection("goals")
+    deleted = await goals.find_one_and_delete(
+        {"_id": ObjectId(goal_id), "user_id": user_id},
+        projection={"date": 1}
+    )
+    if not deleted:
+        return False
+    await invalidate_month(user_id, iso_day(deleted["date"]))
+    return True
+
+async def goal_status_counts(user_id: str) -> Optional[dict]:
+    """Total goals and per-status counts in a single aggregation, or None if the user has none"""
+    goals = await require_collection("goals")
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {
+            "$group": {
+                "_id": None,
+                "total_goals": {"$sum": 1},
+                "completed_goals": {
+                    "$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}
+                },
+                "pending_goals": {
+                    "$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}
+                },
+                "in_progress_goals": {
+                    "$sum": {"$cond": [{"$eq": ["$status", "in_progress"]}, 1, 0]}
+                },
+                "missed_goals": {
+                    "$sum": {"$cond": [{"$eq": ["$status", "missed"]}, 1, 0]}
+                }
+            }
+        }
+    ]
+    result = await goals.aggregate(pipeline).to_list(length=1)
+    return result[0] if result else None
+
+async def goal_stats(user_id: str) -> GoalStats:
+    """Per-status counts and the completion rate (all zeros for a user without goals)"""
+    counts = await goal_status_counts(user_id)
+    if not counts:
+        return GoalStats(
+            total_goals=0, completed_goals=0, pending_goals=0,
+            in_progress_goals=0, missed_goals=0, completion_rate=0
+        )
+    total = counts["total_goals"]
+    completed = counts["completed_goals"]
+    return GoalStats(
+        total_goals=total,
+        completed_goals=completed,
+        pending_goals=counts["pending_goals"],
+        in_progress_goals=counts["in_progress_goals"],
+        missed_goals=counts["missed_goals"],
+        completion_rate=(completed / total * 100) if total > 0 else 0
+    )
+
+# Statuses of goals that can still be completed
+OPEN_STATUSES = ["pending", "in_progress"]
+
+async def expire_goals(cutoff: str, batch_size: int, pause: float) -> int:
+    """
+    Mark open goals dated before cutoff as missed. Works through the
+    (status, date) index in chunks: each chunk's ids are read in index order
+    and closed with one update_many, with a pause between chunks so a large
+    backlog doesn't monopolise the server. Marked goals leave the open
+    statuses, so every chunk restarts from the front of the index. Returns the
+    number of goals marked, or 0 if the database is offline.
+    """
+    goals = await writable_collection("goals")
+    if goals is None:
+        return 0
+
+    query = {"status": {"$in": OPEN_STATUSES}, **_date_range(lt=cutoff)}
+    expired = 0
+    while True:
+        batch = await goals.find(query, {"user_id": 1, "date": 1}).sort(
+            [("status", 1), ("date", 1)]
+        ).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        # The status filter is repeated so a goal completed since the read is left alone
+        result = await goals.update_many(
+            {"_id": {"$in": [goal["_id"] for goal in batch]}, "status": {"$in": OPEN_STATUSES}},
+            {"$set": {"status": "missed", "updated_at": datetime.utcnow()}}
+        )
+        expired += result.modified_count
+        for user_id, goal_month in {(goal["user_id"], iso_day(goal["date"])[:7]) for goal in batch}:
+            await goal_cache.invalidate((user_id, goal_month))
+
+        if len(batch) < batch_size:
+            break
+        await asyncio.sleep(pause)
+    return expired
+
+async def run_goal_expiry():
+    """Background task: periodically mark past goals that were never completed as missed"""
+    while True:
+        try:
+            # Goal dates are the user's local day and no timezone is stored: somewhere
+            # west of UTC it can still be yesterday, so only goals older than that are past
+            yesterday = datetime.utcnow().date() - timedelta(days=1)
+            expired = await expire_goals(
+                yesterday.isoformat(),
+                settings.GOAL_EXPIRY_BATCH_SIZE,
+                settings.GOAL_EXPIRY_PAUSE_SECONDS
+            )
+            if expired:
+                logger.info(f"✅ Marked {expired} past goals as missed")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Goal expiry failed: {type(e).__name__}: {e}")
+        await asyncio.sleep(settings.GOAL_EXPIRY_INTERVAL_SECONDS)
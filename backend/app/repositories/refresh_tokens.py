@@ -0,0 +1,85 @@
+# Refresh tokens repository
+"""
+Rotating refresh tokens. Only the SHA-256 of a token is stored, as the
+document _id, so the lookup on refresh is a single _id read. Every refresh
+marks the presented token used and issues its successor in the same family.
+The successor is an HMAC of the presented token, so several tabs refreshing
+with the same token within REFRESH_TOKEN_REUSE_GRACE_SECONDS all get the same
+successor without it ever being stored. Presenting a used token after that
+means it was copied, so the whole family is revoked. A TTL index removes
+tokens once they expire.
+"""
+
+import base64
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.db.indexes import declare_index, declare_query
+from app.db.mongodb import require_collection
+
+declare_index("refresh_tokens", [("expires_at", 1)], expireAfterSeconds=0)
+# Revoking a family after reuse
+declare_index("refresh_tokens", [("family", 1)])
+
+declare_query("refresh_tokens", "revoke_family", {"family": "f" * 32})
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _successor(token: str) -> str:
+    """The token a refresh with token issues; only derivable with both the token and the secret key"""
+    digest = hmac.new(settings.SECRET_KEY.encode(), token.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+async def issue(user_id: str, email: Optional[str], family: Optional[str] = None, token: Optional[str] = None) -> str:
+    """Store a refresh token (a new random one unless given; starting a family unless one is given) and return it"""
+    token = token or secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    refresh_tokens = await require_collection("refresh_tokens")
+    # An upsert, so storing a derived successor twice is harmless
+    await refresh_tokens.update_one({"_id": _hash(token)}, {"$setOnInsert": {
+        "user_id": user_id,
+        "email": email,
+        "family": family or secrets.token_hex(16),
+        "used": False,
+        "created_at": now,
+        "expires_at": now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    }}, upsert=True)
+    return token
+
+async def rotate(token: str) -> Optional[Tuple[dict, str]]:
+    """
+    Consume a refresh token and issue its successor: (token document,
+    new refresh token), or None if the token is unknown, expired or
+    already used outside the grace window (which revokes its family).
+    """
+    refresh_tokens = await require_collection("refresh_tokens")
+    now = datetime.utcnow()
+    current = await refresh_tokens.find_one_and_update(
+        {"_id": _hash(token), "used": False, "expires_at": {"$gt": now}},
+        {"$set": {"used": True, "used_at": now}},
+        projection={"user_id": 1, "email": 1, "family": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if current is None:
+        reused = await refresh_tokens.find_one(
+            {"_id": _hash(token), "used": True},
+            {"user_id": 1, "email": 1, "family": 1, "used_at": 1}
+        )
+        if reused is None:
+            return None
+        if reused.get("used_at") and now - reused["used_at"] <= timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS):
+            # A concurrent refresh from another tab: hand out the same successor
+            current = reused
+        else:
+            await refresh_tokens.delete_many({"family": reused["family"]})
+            return None
+
+    successor = await issue(current["user_id"], current.get("email"), family=current["family"], token=_successor(token))
+    return current, successor
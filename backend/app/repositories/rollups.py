@@ -0,0 +1,99 @@
+# Daily rollups repository
+"""
+daily_rollups holds one document per (user_id, date, exercise_type) with the
+reps, duration, calories and session count of that day. It is maintained with
+$inc deltas on the session write path, so stats, streaks and calendar views
+read O(days) pre-summed documents instead of scanning every session.
+
+Journal replay records each applied delta on the document, so a replay after a
+crash can't count it twice; scripts/backfill_daily_rollups.py still rebuilds
+the totals exactly if they ever drift.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from app.db.indexes import declare_index, declare_query
+from app.db.journal import journal_update
+from app.db.mongodb import require_collection
+from app.models.rollup import DailyRollup
+
+METRICS = ("session_count", "reps", "duration", "calories")
+
+declare_index("daily_rollups", [("user_id", 1), ("date", -1), ("exercise_type", 1)], unique=True)
+
+declare_query(
+    "daily_rollups", "activity_days",
+    {"user_id": "google_1", "date": {"$gte": "2026-10-01", "$lte": "2026-10-31"}, "session_count": {"$gt": 0}},
+    sort=[("date", -1)]
+)
+declare_query(
+    "daily_rollups", "streak_days",
+    {"user_id": "google_1", "date": {"$lte": "2026-10-18"}, "session_count": {"$gt": 0}},
+    sort=[("date", -1)], projection={"_id": 0, "date": 1}
+)
+
+def session_metrics(session: Optional[dict]) -> dict:
+    """What one session contributes to its day's rollup (all zero for no session)"""
+    if not session:
+        return {metric: 0 for metric in METRICS}
+    return {
+        "session_count": 1,
+        "reps": session.get("reps") or 0,
+        "duration": session.get("duration") or 0,
+        "calories": session.get("calories_burned") or 0,
+    }
+
+def metrics_delta(new: dict, old: dict) -> dict:
+    """Non-zero differences between two session_metrics results"""
+    return {metric: new[metric] - old[metric] for metric in METRICS if new[metric] != old[metric]}
+
+def session_day(session: dict) -> str:
+    """UTC day a session counts towards"""
+    created = session.get("created_at") or session.get("timestamp") or datetime.utcnow()
+    return created.date().isoformat()
+
+def rollup_update(session: dict, delta: dict) -> dict:
+    """Journal-able upsert that applies delta to the session's day rollup"""
+    return journal_update(
+        {
+            "user_id": session["user_id"],
+            "date": session_day(session),
+            "exercise_type": session.get("exercise_type")
+        },
+        {"$inc": delta},
+        upsert=True
+    )
+
+async def activity_days(user_id: str, start_date: str, end_date: str) -> List[DailyRollup]:
+    """Active days' rollups between two ISO dates, newest first"""
+    rollups = await require_collection("daily_rollups")
+    cursor = rollups.find(
+        {"user_id": user_id, "date": {"$gte": start_date, "$lte": end_date}, "session_count": {"$gt": 0}},
+        {"_id": 0, "date": 1, "exercise_type": 1, **{metric: 1 for metric in METRICS}}
+    ).sort("date", -1)
+    return [DailyRollup.model_validate(doc) async for doc in cursor]
+
+async def current_streak(user_id: str, today: date) -> int:
+    """
+    Consecutive active days ending today (or yesterday, if today has no session yet)
+    Reads only the rollups inside the streak, newest first
+    """
+    rollups = await require_collection("daily_rollups")
+    cursor = rollups.find(
+        {"user_id": user_id, "date": {"$lte": today.isoformat()}, "session_count": {"$gt": 0}},
+        {"_id": 0, "date": 1}
+    ).sort("date", -1)
+
+    streak = 0
+    expected = today
+    async for doc in cursor:
+        day = date.fromisoformat(doc["date"])
+        if day > expected:
+            continue  # Another exercise on a day already counted
+        if day == expected or (streak == 0 and day == today - timedelta(days=1)):
+            streak += 1
+            expected = day - timedelta(days=1)
+        else:
+            break
+    return streak
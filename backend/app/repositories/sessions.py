@@ -0,0 +1,370 @@
+# Sessions repository
+"""
+Sessions live in one of two collections, selected by settings.SESSION_STORAGE:
+
+- "collection": the plain sessions collection (default)
+- "dual": new sessions go to the session_series time-series collection
+  (timeField timestamp, metaField user_id) while
+  scripts/migrate_sessions_to_timeseries.py moves settled sessions over;
+  reads consult both and merge
+- "timeseries": session_series only, once the migration has emptied sessions
+
+Time-series collections need MongoDB 7.0+ here, for updates and deletes on
+measurement fields. They support neither upserts nor findAndModify, so
+inserts are plain inserts and read-modify-write takes two round trips.
+"""
+
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.db.indexes import declare_collection, declare_index, declare_query
+from app.db.journal import write_or_journal, journal_insert, journal_update, writable_collection
+from app.db.mongodb import require_collection
+from app.models.session import SessionResponse, SessionHistoryItem
+from app.utils.pagination import encode_cursor, keyset_filter
+
+LEGACY_COLLECTION = "sessions"
+TIMESERIES_COLLECTION = "session_series"
+
+# Fields returned by the session endpoints (and held in the write buffer)
+SESSION_PROJECTION = {
+    "user_id": 1,
+    "exercise_name": 1,
+    "exercise_type": 1,
+    "reps": 1,
+    "duration": 1,
+    "calories_burned": 1,
+    "completed": 1,
+    "timestamp": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+# History entries fall back to created_at for sessions written before timestamp existed
+HISTORY_PROJECTION = {
+    "exercise_name": 1,
+    "exercise_type": 1,
+    "reps": 1,
+    "duration": 1,
+    "calories_burned": 1,
+    "completed": 1,
+    "timestamp": {"$ifNull": ["$timestamp", "$created_at"]},
+}
+
+# Lists page newest first by (created_at, _id); history by (timestamp, _id).
+# _id is the tie-breaker that makes keyset cursors exact.
+declare_index(LEGACY_COLLECTION, [("user_id", 1), ("created_at", -1), ("_id", -1)])
+declare_index(LEGACY_COLLECTION, [("user_id", 1), ("timestamp", -1), ("_id", -1)])
+
+# The time-series layout buckets each user's sessions by time; every list is
+# ordered by (timestamp, _id) there
+declare_collection(
+    TIMESERIES_COLLECTION,
+    timeseries={"timeField": "timestamp", "metaField": "user_id", "granularity": "hours"}
+)
+declare_index(TIMESERIES_COLLECTION, [("user_id", 1), ("timestamp", -1), ("_id", -1)])
+declare_index(TIMESERIES_COLLECTION, [("user_id", 1), ("_id", 1)])
+
+_SAMPLE_FIRST = {"created_at": {"$type": "date"}}
+_SAMPLE_AFTER = {**_SAMPLE_FIRST, "$or": [
+    {"created_at": {"$lt": datetime(2026, 10, 18)}},
+    {"created_at": datetime(2026, 10, 18), "_id": {"$lt": ObjectId()}}
+]}
+
+declare_query(LEGACY_COLLECTION, "find_session", {"_id": ObjectId(), "user_id": "google_1"})
+declare_query(LEGACY_COLLECTION, "list_sessions", {"user_id": "google_1", **_SAMPLE_FIRST}, sort=[("created_at", -1), ("_id", -1)])
+declare_query(
+    LEGACY_COLLECTION, "list_sessions_page",
+    {"user_id": "google_1", **_SAMPLE_AFTER},
+    sort=[("created_at", -1), ("_id", -1)]
+)
+declare_query(
+    LEGACY_COLLECTION, "list_sessions_by_type",
+    {"user_id": "google_1", "exercise_type": "pushup", **_SAMPLE_FIRST},
+    sort=[("created_at", -1), ("_id", -1)]
+)
+declare_query(
+    LEGACY_COLLECTION, "session_history", {"user_id": "google_1", "timestamp": {"$type": "date"}},
+    sort=[("timestamp", -1), ("_id", -1)], projection=HISTORY_PROJECTION
+)
+declare_query(TIMESERIES_COLLECTION, "find_session", {"_id": ObjectId(), "user_id": "google_1"})
+declare_query(TIMESERIES_COLLECTION, "list_sessions", {"user_id": "google_1", "timestamp": {"$type": "date"}}, sort=[("timestamp", -1), ("_id", -1)])
+
+def write_collection() -> str:
+    """Collection new sessions are inserted into"""
+    return LEGACY_COLLECTION if settings.SESSION_STORAGE == "collection" else TIMESERIES_COLLECTION
+
+def read_collections() -> List[str]:
+    """Collections a session may be in, most likely first"""
+    if settings.SESSION_STORAGE == "collection":
+        return [LEGACY_COLLECTION]
+    if settings.SESSION_STORAGE == "dual":
+        return [TIMESERIES_COLLECTION, LEGACY_COLLECTION]
+    return [TIMESERIES_COLLECTION]
+
+def all_sessions_pipeline(match: dict) -> Tuple[str, List[dict]]:
+    """
+    Aggregation source over every collection a session may be in: the
+    collection to aggregate on and the leading stages, which $unionWith the
+    others and keep one copy of a session caught mid-migration
+    """
+    first, *others = read_collections()
+    stages = [{"$match": match}]
+    for collection_name in others:
+        stages.append({"$unionWith": {"coll": collection_name, "pipeline": [{"$match": match}]}})
+    if others:
+        stages += [
+            {"$group": {"_id": "$_id", "session": {"$first": "$$ROOT"}}},
+            {"$replaceWith": "$session"}
+        ]
+    return first, stages
+
+def list_sort_field() -> str:
+    """Keyset field of session lists; time-series collections order by their timeField"""
+    return "created_at" if settings.SESSION_STORAGE == "collection" else "timestamp"
+
+def _newest_first(docs: List[dict], field: str, limit: int) -> List[dict]:
+    """Merge pages read from several collections, dropping copies of a session caught mid-migration"""
+    seen = set()
+    merged = []
+    for doc in sorted(docs, key=lambda d: (d[field], d["_id"]), reverse=True):
+        if doc["_id"] not in seen:
+            seen.add(doc["_id"])
+            merged.append(doc)
+    return merged[:limit]
+
+async def insert_session(session: dict) -> str:
+    """
+    Insert a new session (journaled while offline) and return the collection it went to.
+    The legacy collection uses an upsert so a replayed insert is idempotent; journal
+    replay skips time-series inserts whose _id is already stored.
+    """
+    collection_name = write_collection()
+    if collection_name == LEGACY_COLLECTION:
+        operation = journal_update({"_id": session["_id"]}, {"$setOnInsert": session}, upsert=True)
+    else:
+        operation = journal_insert(session)
+    await write_or_journal(collection_name, [operation])
+    return collection_name
+
+async def ingest_sessions(user_id: str, sessions: List[dict]) -> Tuple[List[dict], List[ObjectId], List[ObjectId]]:
+    """
+    Store sessions with client-generated _ids in one unordered bulk write.
+    Returns the sessions that were new (ids already stored, or repeated within
+    the batch, are skipped, so a client can safely resend a batch), the ids
+    rejected because another user owns them and the ids the database failed to
+    store. Needs the database: the caller's client keeps its own queue.
+    """
+    collection_name = write_collection()
+    collection = await writable_collection(collection_name)
+    if collection is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database connection not available"
+        )
+
+    # First copy of each id wins
+    unique = {}
+    for session in sessions:
+        unique.setdefault(session["_id"], session)
+    sessions = list(unique.values())
+    ids = [session["_id"] for session in sessions]
+    if collection_name == TIMESERIES_COLLECTION:
+        # No upserts on time-series collections: skip stored ids, then insert the rest
+        stored = await collection.find({"_id": {"$in": ids}}, {"user_id": 1}).to_list(length=None)
+        taken = {doc["_id"]: doc.get("user_id") for doc in stored}
+        new = [session for session in sessions if session["_id"] not in taken]
+        rejected = [_id for _id, owner in taken.items() if owner != user_id]
+        failed_indexes = set()
+        if new:
+            try:
+                await collection.insert_many(new, ordered=False)
+            except BulkWriteError as e:
+                # Unordered: every document without an error was stored
+                failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+        failed = [new[index]["_id"] for index in sorted(failed_indexes)]
+        return [session for index, session in enumerate(new) if index not in failed_indexes], rejected, failed
+
+    operations = [
+        UpdateOne({"_id": session["_id"], "user_id": user_id}, {"$setOnInsert": session}, upsert=True)
+        for session in sessions
+    ]
+    rejected, failed = [], []
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        upserted = result.upserted_ids
+    except BulkWriteError as e:
+        upserted = {item["index"]: item["_id"] for item in e.details.get("upserted", [])}
+        for error in e.details.get("writeErrors", []):
+            # An _id owned by another user fails the upsert with a duplicate key error
+            (rejected if error.get("code") == 11000 else failed).append(sessions[error["index"]]["_id"])
+    return [sessions[index] for index in upserted], rejected, failed
+
+async def find_session(session_id: str, user_id: str) -> Optional[dict]:
+    """Projected session document owned by user_id"""
+    for collection_name in read_collections():
+        sessions = await require_collection(collection_name)
+        session = await sessions.find_one(
+            {"_id": ObjectId(session_id), "user_id": user_id},
+            SESSION_PROJECTION
+        )
+        if session:
+            return session
+    return None
+
+async def update_session(session_id: str, user_id: str, fields: dict) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Apply fields and return the projected document as it was before the update
+    (callers merge fields themselves; the old values are what daily_rollups
+    currently holds for the session), plus the collection it lives in.
+    (None, None) if the user has no such session.
+    """
+    query = {"_id": ObjectId(session_id), "user_id": user_id}
+    for collection_name in read_collections():
+        sessions = await require_collection(collection_name)
+        if collection_name == LEGACY_COLLECTION:
+            # One round trip
+            previous = await sessions.find_one_and_update(
+                query,
+                {"$set": fields},
+                projection=SESSION_PROJECTION,
+                return_document=ReturnDocument.BEFORE
+            )
+        else:
+            previous = await sessions.find_one(query, SESSION_PROJECTION)
+            if previous:
+                await sessions.update_one(query, {"$set": fields})
+        if previous:
+            return previous, collection_name
+    return None, None
+
+async def journal_session_update(session_id: str, user_id: str, fields: dict):
+    """Record a session update for replay once the database is reachable"""
+    # Where the session lives isn't known offline; the update is a no-op in the other collection
+    for collection_name in read_collections():
+        await write_or_journal(collection_name, [
+            journal_update({"_id": ObjectId(session_id), "user_id": user_id}, {"$set": fields})
+        ])
+
+async def can_write_directly() -> bool:
+    """Whether session writes can go straight to MongoDB right now"""
+    return await writable_collection(write_collection()) is not None
+
+async def list_sessions(
+    user_id: str,
+    exercise_type: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Tuple[List[SessionResponse], Optional[str]]:
+    """
+    One page of sessions, newest first, and the cursor for the next page (None on the last page).
+    Raises ValueError for an invalid cursor.
+    """
+    field = list_sort_field()
+    query = {"user_id": user_id, **keyset_filter(field, cursor)}
+    if exercise_type:
+        query["exercise_type"] = exercise_type
+
+    # Fetch one extra document to learn whether another page exists
+    docs = []
+    for collection_name in read_collections():
+        sessions = await require_collection(collection_name)
+        page = sessions.find(query, SESSION_PROJECTION).sort([(field, -1), ("_id", -1)]).limit(limit + 1)
+        docs.extend(await page.to_list(length=limit + 1))
+    docs = _newest_first(docs, field, limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1][field], docs[-1]["_id"])
+    return [SessionResponse.model_validate(doc) for doc in docs], next_cursor
+
+async def session_history(
+    user_id: str,
+    limit: int = 10,
+    cursor: Optional[str] = None
+) -> Tuple[List[SessionHistoryItem], Optional[str]]:
+    """
+    One page of history entries, newest first, and the cursor for the next page.
+    Sessions without a timestamp are skipped (migration 2 in app/migrations backfills them).
+    Raises ValueError for an invalid cursor.
+    """
+    query = {"user_id": user_id, **keyset_filter("timestamp", cursor)}
+
+    docs = []
+    for collection_name in read_collections():
+        sessions = await require_collection(collection_name)
+        page = sessions.find(query, HISTORY_PROJECTION).sort([("timestamp", -1), ("_id", -1)]).limit(limit + 1)
+        docs.extend(await page.to_list(length=limit + 1))
+    docs = _newest_first(docs, "timestamp", limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["timestamp"], docs[-1]["_id"])
+    return [SessionHistoryItem.model_validate(doc) for doc in docs], next_cursor
+
+# Columns of a session export, in order
+EXPORT_FIELDS = [
+    "_id", "exercise_name", "exercise_type", "reps", "duration",
+    "calories_burned", "completed", "timestamp", "created_at", "updated_at",
+]
+
+async def _next_or_none(cursor) -> Optional[dict]:
+    try:
+        return await cursor.__anext__()
+    except StopAsyncIteration:
+        return None
+
+async def _merge_newest_first(cursors: list, field: str) -> AsyncIterator[dict]:
+    """
+    Merge cursors that are each sorted newest first by (field, _id). Only the
+    current head of each cursor is held, and a session caught mid-migration
+    is the head of both at once, so its second copy is dropped on the spot.
+    """
+    heads = [await _next_or_none(cursor) for cursor in cursors]
+    while any(head is not None for head in heads):
+        newest = max((head for head in heads if head is not None), key=lambda d: (d[field], d["_id"]))
+        yield newest
+        for i, head in enumerate(heads):
+            if head is not None and head["_id"] == newest["_id"]:
+                heads[i] = await _next_or_none(cursors[i])
+
+async def iter_sessions(user_id: str, batch_size: int) -> AsyncIterator[dict]:
+    """
+    Open a stream of every session of a user, newest first, batch_size
+    documents per round trip. The collections are checked before returning,
+    so an unreachable database fails the request instead of the stream.
+    """
+    projection = {field: 1 for field in EXPORT_FIELDS}
+    field = list_sort_field()
+    cursors = []
+    for collection_name in read_collections():
+        sessions = await require_collection(collection_name)
+        cursor = sessions.find({"user_id": user_id}, projection).sort([(field, -1), ("_id", -1)])
+        cursor.batch_size(batch_size)
+        cursors.append(cursor)
+    if len(cursors) == 1:
+        return cursors[0]
+    return _merge_newest_first(cursors, field)
+
+async def delete_session(session_id: str, user_id: str) -> Optional[dict]:
+    """Delete a session owned by user_id and return the deleted document (None if there was none)"""
+    query = {"_id": ObjectId(session_id), "user_id": user_id}
+    deleted = None
+    for collection_name in read_collections():
+        sessions = await require_collection(collection_name)
+        if collection_name == LEGACY_COLLECTION:
+            doc = await sessions.find_one_and_delete(query, projection=SESSION_PROJECTION)
+        else:
+            doc = await sessions.find_one(query, SESSION_PROJECTION)
+            if doc:
+                await sessions.delete_many(query)
+        deleted = deleted or doc
+    return deleted
@@ -0,0 +1,46 @@
+# User stats repository
+"""
+user_stats holds one document per user (_id = user_id) with lifetime session
+totals. It is updated with the same $inc deltas as daily_rollups, so
+/api/users/stats is a single _id point read, served from a TTL cache when
+warm. scripts/backfill_user_stats.py builds it for existing users.
+"""
+
+from collections import defaultdict
+from typing import Dict, List
+
+from app.core.config import settings
+from app.db.indexes import declare_query
+from app.db.journal import journal_update
+from app.db.mongodb import require_collection
+from app.repositories.rollups import METRICS
+from app.utils.cache import create_cache
+
+declare_query("user_stats", "get_user_stats", {"_id": "google_1"})
+
+stats_cache = create_cache(
+    "user_stats",
+    max_entries=settings.USER_STATS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.USER_STATS_CACHE_TTL_SECONDS
+)
+
+def stats_updates(deltas: List[tuple]) -> List[dict]:
+    """One journal-able $inc upsert per user for a list of (user_id, metrics delta) pairs"""
+    per_user: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+    for user_id, delta in deltas:
+        for metric, value in delta.items():
+            per_user[user_id][metric] += value
+    return [
+        journal_update({"_id": user_id}, {"$inc": dict(totals)}, upsert=True)
+        for user_id, totals in per_user.items()
+    ]
+
+async def get_user_stats(user_id: str) -> dict:
+    """Lifetime totals for a user (zeros for a user without sessions)"""
+    stats = await stats_cache.get(user_id)
+    if stats is None:
+        collection = await require_collection("user_stats")
+        doc = await collection.find_one({"_id": user_id}) or {}
+        stats = {metric: doc.get(metric, 0) for metric in METRICS}
+        await stats_cache.set(user_id, stats)
+    return stats
@@ -0,0 +1,114 @@
+# Users repository
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.db.indexes import declare_index, declare_query
+from app.db.mongodb import require_collection
+from app.models.user import UserProfile, AvatarStatus
+from app.utils.cache import create_cache
+
+PROFILE_PROJECTION = {
+    "user_id": 1,
+    "name": 1,
+    "email": 1,
+    "picture": 1,
+    "avatar": 1,
+    "avatar_selected": 1,
+    "created_at": 1,
+    "last_login": 1,
+}
+
+PRINCIPAL_PROJECTION = {"_id": 0, "user_id": 1, "email": 1, "name": 1}
+
+AVATAR_PROJECTION = {"_id": 0, "avatar": 1, "avatar_selected": 1}
+
+declare_index("users", [("user_id", 1)], unique=True)
+
+declare_query("users", "get_user", {"user_id": "google_1"})
+
+# {id, email, name} per user_id, read on every authenticated request; the
+# writes below that change a user invalidate it
+principal_cache = create_cache(
+    "principals",
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+async def get_principal(user_id: str) -> Optional[dict]:
+    """{id, email, name} for an authenticated user, or None if unknown"""
+    principal = await principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    users = await require_collection("users")
+    user = await users.find_one({"user_id": user_id}, PRINCIPAL_PROJECTION)
+    if user is None:
+        return None
+    principal = {"id": user["user_id"], "email": user.get("email"), "name": user.get("name")}
+    await principal_cache.set(user_id, principal)
+    return principal
+
+async def get_profile(user_id: str) -> Optional[UserProfile]:
+    users = await require_collection("users")
+    user = await users.find_one({"user_id": user_id}, PROFILE_PROJECTION)
+    return UserProfile.model_validate(user) if user else None
+
+async def update_profile(user_id: str, fields: dict) -> Optional[UserProfile]:
+    """Apply fields and return the updated profile in one round trip"""
+    if not fields:
+        return await get_profile(user_id)
+
+    users = await require_collection("users")
+    user = await users.find_one_and_update(
+        {"user_id": user_id},
+        {"$set": fields},
+        projection=PROFILE_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    await principal_cache.invalidate(user_id)
+    return UserProfile.model_validate(user) if user else None
+
+async def get_avatar(user_id: str) -> Optional[AvatarStatus]:
+    users = await require_collection("users")
+    user = await users.find_one({"user_id": user_id}, AVATAR_PROJECTION)
+    return AvatarStatus.model_validate(user) if user else None
+
+async def set_avatar(user_id: str, avatar_id: str) -> bool:
+    """Select an avatar; False if the user is unknown or already has it"""
+    users = await require_collection("users")
+    result = await users.update_one(
+        {"user_id": user_id},
+        {
+            "$set": {
+                "avatar": avatar_id,
+                "avatar_selected": True,
+                "last_login": datetime.utcnow()
+            }
+        }
+    )
+    await principal_cache.invalidate(user_id)
+    return result.modified_count > 0
+
+async def upsert_google_user(user_id: str, name: str, email: str, picture: Optional[str]) -> bool:
+    """Create or refresh a user on Google login in one upsert; True if the user is new"""
+    users = await require_collection("users")
+    current_time = datetime.utcnow()
+    result = await users.update_one(
+        {"user_id": user_id},
+        {
+            "$set": {
+                "user_id": user_id,
+                "name": name,
+                "email": email,
+                "picture": picture,
+                "last_login": current_time
+            },
+            "$setOnInsert": {"created_at": current_time}
+        },
+        upsert=True
+    )
+    await principal_cache.invalidate(user_id)
+    return result.upserted_id is not None
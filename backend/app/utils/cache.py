@@ -0,0 +1,172 @@
+# Caches
+"""
+Small LRU + TTL cache for hot, per-user lookups. Entries expire after
+ttl_seconds and the least recently used entry is dropped beyond max_entries.
+Writers call invalidate() after changing the underlying data.
+
+Caches whose invalidations must reach every worker go through a backend from
+create_cache(): in-process by default, or Redis when CACHE_REDIS_URL is set
+(requires the optional redis package), so all workers share one copy.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from bson import json_util
+
+from app.core.config import settings
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Optional dependency, only needed for a shared cache
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+class TTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value, or default if absent or expired"""
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING or entry[0] <= time.monotonic():
+            if entry is not _MISSING:
+                del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Cache value for ttl_seconds (default: the cache's TTL)"""
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop a key after the data behind it changed"""
+        if self._entries.pop(key, _MISSING) is not _MISSING:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+class MemoryCacheBackend:
+    """Cache backend local to this process (coherent within one worker only)"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._cache = TTLCache(max_entries, ttl_seconds)
+
+    async def get(self, key: Hashable) -> Any:
+        return self._cache.get(key)
+
+    async def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        self._cache.set(key, value, ttl_seconds)
+
+    async def invalidate(self, key: Hashable):
+        self._cache.invalidate(key)
+
+    def metrics(self) -> dict:
+        return self._cache.metrics()
+
+class RedisCacheBackend:
+    """
+    Cache backend shared by every worker through Redis. Values are stored as
+    extended JSON, so documents with ObjectIds and datetimes round-trip.
+    Redis errors degrade to cache misses rather than failing the request.
+    """
+
+    def __init__(self, client, namespace: str, ttl_seconds: float):
+        self.client = client
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _name(self, key: Hashable) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.namespace, *(str(part) for part in parts)])
+
+    async def get(self, key: Hashable) -> Any:
+        try:
+            raw = await self.client.get(self._name(key))
+        except Exception as e:
+            logger.warning(f"⚠️ Cache read failed ({self.namespace}): {e}")
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json_util.loads(raw)
+
+    async def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        try:
+            await self.client.set(self._name(key), json_util.dumps(value), px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            logger.warning(f"⚠️ Cache write failed ({self.namespace}): {e}")
+
+    async def invalidate(self, key: Hashable):
+        try:
+            await self.client.delete(self._name(key))
+            self.invalidations += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Cache invalidation failed ({self.namespace}), entry expires with its TTL: {e}")
+
+    def metrics(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations}
+
+_redis_client = None
+_caches: Dict[str, Any] = {}
+
+def shared_redis():
+    """Redis client for state shared between workers, or None when CACHE_REDIS_URL is unset or redis is missing"""
+    global _redis_client
+    if not settings.CACHE_REDIS_URL:
+        return None
+    if redis_asyncio is None:
+        logger.warning("⚠️ CACHE_REDIS_URL is set but the redis package is not installed; using in-process state")
+        return None
+    if _redis_client is None:
+        _redis_client = redis_asyncio.from_url(settings.CACHE_REDIS_URL)
+    return _redis_client
+
+def create_cache(namespace: str, max_entries: int, ttl_seconds: float):
+    """Cache backend for namespace: shared Redis when configured, else in-process"""
+    client = shared_redis()
+    if client is not None:
+        backend = RedisCacheBackend(client, namespace, ttl_seconds)
+    else:
+        backend = MemoryCacheBackend(max_entries, ttl_seconds)
+    return register_cache(namespace, backend)
+
+def register_cache(namespace: str, cache):
+    """Include a cache (anything with metrics()) in cache_metrics(); returns it"""
+    _caches[namespace] = cache
+    return cache
+
+def cache_metrics() -> Dict[str, dict]:
+    """Hit, miss and invalidation counts of every cache created in this worker, by namespace"""
+    return {namespace: backend.metrics() for namespace, backend in _caches.items()}
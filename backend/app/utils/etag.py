@@ -0,0 +1,41 @@
+# Entity tags
+"""
+Weak ETags for read endpoints. A tag is a short hash of whatever identifies
+the content of a response (the documents it is built from, or a static
+catalog). Routes compute it before the body is serialized and answer a
+matching If-None-Match with an empty 304 Not Modified.
+"""
+
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Response, status
+
+from app.utils.serialization import dumps
+
+# Let clients store responses but revalidate them on every use
+REVALIDATE = "private, no-cache"
+
+def weak_etag(content: Any) -> str:
+    """Weak ETag of JSON-serializable content (BSON values allowed)"""
+    return f'W/"{hashlib.sha1(dumps(content)).hexdigest()[:16]}"'
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-Match / If-None-Match comparison (weak: the W/ prefix is ignored)"""
+    def opaque(tag: str) -> str:
+        return tag.strip().removeprefix("W/")
+    return any(
+        tag.strip() == "*" or opaque(tag) == opaque(etag)
+        for tag in header.split(",")
+    )
+
+def conditional(response: Response, if_none_match: Optional[str], etag: str, cache_control: str = REVALIDATE) -> Optional[Response]:
+    """
+    Set ETag and Cache-Control on response; returns a 304 to send instead
+    when If-None-Match already names etag
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,42 @@
+"""
+Streaming export helpers
+Serialize documents one at a time as they come off a Motor cursor, so an
+export never holds more than the current cursor batch in memory.
+"""
+
+import csv
+import io
+from typing import AsyncIterator, List
+
+from app.utils.serialization import dumps, plain_value
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+async def ndjson_rows(documents: AsyncIterator[dict], fields: List[str]) -> AsyncIterator[str]:
+    """One JSON object per line"""
+    async for document in documents:
+        row = {field: plain_value(document.get(field)) for field in fields}
+        yield dumps(row).decode() + "\n"
+
+async def csv_rows(documents: AsyncIterator[dict], fields: List[str]) -> AsyncIterator[str]:
+    """Header line, then one CSV line per document"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(fields)
+    yield buffer.getvalue()
+
+    async for document in documents:
+        buffer.seek(0)
+        buffer.truncate(0)
+        writer.writerow([plain_value(document.get(field)) for field in fields])
+        yield buffer.getvalue()
+
+def export_rows(documents: AsyncIterator[dict], fields: List[str], format: str) -> AsyncIterator[str]:
+    """Serializer for the requested export format ("ndjson" or "csv")"""
+    if format == "csv":
+        return csv_rows(documents, fields)
+    return ndjson_rows(documents, fields)
@@ -0,0 +1,46 @@
+"""
+Keyset pagination helpers
+Opaque cursor tokens encode the (sort value, _id) of the last item on a page,
+so the next page starts with an index seek instead of skipping documents.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from bson import ObjectId
+
+def encode_cursor(sort_value: datetime, last_id) -> str:
+    """Opaque token for the page after the item with this sort value and _id"""
+    payload = json.dumps({"v": sort_value.isoformat(), "id": str(last_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    """
+    Decode a cursor token back into (sort value, _id)
+    Raises ValueError for tokens that were not produced by encode_cursor
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["v"]), ObjectId(payload["id"])
+    except Exception as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+def keyset_filter(field: str, cursor: Optional[str]) -> dict:
+    """
+    Filter selecting the documents after the cursor for a (field desc, _id desc) sort
+    Documents without a date in field (legacy rows) are left out: they have no cursor position
+    """
+    has_value = {field: {"$type": "date"}}
+    if not cursor:
+        return has_value
+    sort_value, last_id = decode_cursor(cursor)
+    return {
+        **has_value,
+        "$or": [
+            {field: {"$lt": sort_value}},
+            {field: sort_value, "_id": {"$lt": last_id}}
+        ]
+    }
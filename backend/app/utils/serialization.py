@@ -0,0 +1,37 @@
+# JSON serialization
+"""
+BSON-aware JSON encoding shared by API responses and exports, backed by
+orjson. ObjectIds become their hex string and dates/datetimes ISO 8601 text,
+the same forms the response models produce, so a raw document and a model
+serialize identically.
+"""
+
+from datetime import date, datetime
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+
+def plain_value(value):
+    """BSON values as JSON/CSV friendly scalars"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _default(value):
+    # Called by orjson only for types it can't encode natively
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class BSONJSONResponse(ORJSONResponse):
+    """Default response class: orjson rendering that also accepts ObjectIds"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Rebuild the daily_rollups collection from sessions (in whichever collections
+SESSION_STORAGE reads)
+Run once before relying on /api/users/stats and /api/users/activity, and any
+time the rollups need to be made exact again. The API keeps them up to date
+incrementally afterwards.
+
+Usage:
+    python scripts/backfill_daily_rollups.py [user_id]
+
+Live session writes made while the rebuild runs can be overwritten, so run it
+during low traffic.
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.mongodb import connect_to_mongo, get_database, close_mongo_connection
+from app.db.indexes import ensure_indexes
+# Importing the repository registers the unique index $merge matches on
+from app.repositories import rollups, sessions  # noqa: F401
+
+async def backfill_daily_rollups(user_id: str = None):
+    """Recompute every day rollup (optionally for one user) with a single $group/$merge pipeline"""
+    
+    print("=" * 60)
+    print("Backfilling Daily Rollups")
+    print("=" * 60)
+    print()
+    
+    await connect_to_mongo()
+    db = await get_database()
+    
+    if db is None:
+        print("❌ Failed to connect to MongoDB")
+        return
+    
+    await ensure_indexes(db)
+    
+    scope = {"user_id": user_id} if user_id else {}
+    rebuilt_at = datetime.utcnow()
+    
+    # Every collection sessions may be in (see SESSION_STORAGE)
+    source, stages = sessions.all_sessions_pipeline(scope)
+    pipeline = stages + [
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "date": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$ifNull": ["$created_at", "$timestamp"]}}},
+                "exercise_type": "$exercise_type"
+            },
+            "session_count": {"$sum": 1},
+            "reps": {"$sum": {"$ifNull": ["$reps", 0]}},
+            "duration": {"$sum": {"$ifNull": ["$duration", 0]}},
+            "calories": {"$sum": {"$ifNull": ["$calories_burned", 0]}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "date": "$_id.date",
+            "exercise_type": "$_id.exercise_type",
+            "session_count": 1,
+            "reps": 1,
+            "duration": 1,
+            "calories": 1,
+            "rebuilt_at": rebuilt_at
+        }},
+        {"$merge": {
+            "into": "daily_rollups",
+            "on": ["user_id", "date", "exercise_type"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+    
+    print("Aggregating sessions into daily_rollups...")
+    # The dedupe $group may exceed the in-memory stage limit on a large history
+    await db[source].aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+    
+    # Days whose sessions were all deleted were not rewritten above
+    stale = await db.daily_rollups.delete_many({**scope, "rebuilt_at": {"$ne": rebuilt_at}})
+    rebuilt = await db.daily_rollups.count_documents({**scope, "rebuilt_at": rebuilt_at})
+    
+    print(f"✅ Rebuilt {rebuilt} day rollups, removed {stale.deleted_count} stale ones")
+    
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(backfill_daily_rollups(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Build the per-user user_stats documents from sessions (in whichever
+collections SESSION_STORAGE reads)
+Run once before relying on /api/users/stats, and any time the totals need to
+be made exact again. The API keeps them up to date incrementally afterwards.
+
+Usage:
+    python scripts/backfill_user_stats.py [user_id]
+
+Live session writes made while the rebuild runs can be overwritten, so run it
+during low traffic.
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.mongodb import connect_to_mongo, get_database, close_mongo_connection
+from app.repositories import sessions
+
+async def backfill_user_stats(user_id: str = None):
+    """Recompute lifetime totals (optionally for one user) with a single $group/$merge pipeline"""
+    
+    print("=" * 60)
+    print("Backfilling User Stats")
+    print("=" * 60)
+    print()
+    
+    await connect_to_mongo()
+    db = await get_database()
+    
+    if db is None:
+        print("❌ Failed to connect to MongoDB")
+        return
+    
+    scope = {"user_id": user_id} if user_id else {}
+    rebuilt_at = datetime.utcnow()
+    
+    # Every collection sessions may be in (see SESSION_STORAGE)
+    source, stages = sessions.all_sessions_pipeline(scope)
+    pipeline = stages + [
+        {"$group": {
+            "_id": "$user_id",
+            "session_count": {"$sum": 1},
+            "reps": {"$sum": {"$ifNull": ["$reps", 0]}},
+            "duration": {"$sum": {"$ifNull": ["$duration", 0]}},
+            "calories": {"$sum": {"$ifNull": ["$calories_burned", 0]}}
+        }},
+        {"$set": {"rebuilt_at": rebuilt_at}},
+        {"$merge": {"into": "user_stats", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+    
+    print("Aggregating sessions into user_stats...")
+    # The dedupe $group may exceed the in-memory stage limit on a large history
+    await db[source].aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+    
+    # Users whose sessions were all deleted were not rewritten above
+    stale_scope = {"_id": user_id} if user_id else {}
+    stale = await db.user_stats.delete_many({**stale_scope, "rebuilt_at": {"$ne": rebuilt_at}})
+    rebuilt = await db.user_stats.count_documents({**stale_scope, "rebuilt_at": rebuilt_at})
+    
+    print(f"✅ Rebuilt stats for {rebuilt} users, removed {stale.deleted_count} stale documents")
+    
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(backfill_user_stats(sys.argv[1] if len(sys.argv) > 1 else None))
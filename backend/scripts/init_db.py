@@ -12,6 +12,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.db.mongodb import connect_to_mongo, get_collection
+from app.repositories.exercises import bump_catalog_version
 import asyncio
 
 async def init_database():
@@ -68,6 +69,9 @@ async def init_database():
             await exercises_collection.insert_one(exercise)
             print(f"  ✓ Added {exercise['name']}")
     
+    # Running API workers reload their in-memory catalog on the next version check
+    await bump_catalog_version()
+    
     print("\n✅ Database initialization complete!")
     print(f"Total exercises in database: {await exercises_collection.count_documents({})}")
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Run pending data migrations (app/migrations) in order
+
+Usage:
+    python scripts/migrate.py [--list] [--dry-run] [--only N] [--restart]
+        [--batch-size 200] [--rate 500]
+
+Each migration works through its documents in _id order, records its progress
+in the migrations collection after every batch, and resumes from there if
+interrupted. --rate caps the documents processed per second, so migrations
+are safe to run while the API is serving traffic.
+
+Goal dates (migration 1): deploy with GOAL_DATES=dual (the default), run this
+script, then deploy with GOAL_DATES=native.
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.mongodb import connect_to_mongo, get_database, close_mongo_connection
+from app.db.migrations import registered_migrations, read_checkpoints, run_migration
+import app.migrations  # noqa: F401
+
+async def migrate(args):
+    print("=" * 60)
+    print("Running Data Migrations")
+    print("=" * 60)
+    print()
+    
+    await connect_to_mongo()
+    db = await get_database()
+    
+    if db is None:
+        print("❌ Failed to connect to MongoDB")
+        return
+    
+    checkpoints = await read_checkpoints(db)
+    
+    if args.list:
+        for migration in registered_migrations():
+            checkpoint = checkpoints.get(migration.number, {})
+            status = checkpoint.get("status", "pending")
+            print(f"   {migration.number:>3}  {migration.name:<30} {status} ({checkpoint.get('scanned', 0)} scanned)")
+        await close_mongo_connection()
+        return
+    
+    for migration in registered_migrations():
+        if args.only is not None and migration.number != args.only:
+            continue
+        if checkpoints.get(migration.number, {}).get("status") == "done" and not args.restart:
+            continue
+        
+        print(f"▶️  {migration.number}: {migration.name}{' (dry run)' if args.dry_run else ''}")
+        result = await run_migration(
+            db, migration, args.batch_size, args.rate, dry_run=args.dry_run, restart=args.restart
+        )
+        verb = "would write" if args.dry_run else "wrote"
+        print(f"   Scanned {result.scanned} documents, {verb} {result.written}")
+        if result.failed:
+            print(f"   ⚠️ {result.failed} writes failed and were left in place (see the log)")
+    
+    print()
+    print("✅ Migrations complete")
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run pending data migrations")
+    parser.add_argument("--list", action="store_true", help="Show each migration and its status")
+    parser.add_argument("--dry-run", action="store_true", help="Read and convert, but write nothing")
+    parser.add_argument("--only", type=int, help="Run only the migration with this number")
+    parser.add_argument("--restart", action="store_true", help="Ignore checkpoints (also reruns finished migrations)")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=500, help="Maximum documents processed per second")
+    asyncio.run(migrate(parser.parse_args()))
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Move sessions into the session_series time-series collection
+(timeField timestamp, metaField user_id; requires MongoDB 7.0+)
+
+Rollout:
+    1. Deploy with SESSION_STORAGE=dual. New sessions go to session_series and
+       reads consult both collections.
+    2. Run this script (repeatable; each run resumes where the last stopped)
+       until it reports no sessions left to move.
+    3. Deploy with SESSION_STORAGE=timeseries.
+
+Usage:
+    python scripts/migrate_sessions_to_timeseries.py [--dry-run] [--batch-size 500]
+        [--pause 0.5] [--min-age-minutes 60] [--dedupe]
+
+Only sessions not written for --min-age-minutes are moved, so a workout in
+progress is never copied halfway through its updates.
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.db.mongodb import connect_to_mongo, get_database, close_mongo_connection
+from app.db.indexes import ensure_indexes
+from app.repositories.sessions import LEGACY_COLLECTION, TIMESERIES_COLLECTION
+
+async def dedupe(db) -> int:
+    """Collapse sessions inserted twice into session_series (e.g. by a journal replayed twice before replay skipped stored ids)"""
+    series = db[TIMESERIES_COLLECTION]
+    duplicates = series.aggregate([
+        {"$group": {"_id": "$_id", "copies": {"$sum": 1}}},
+        {"$match": {"copies": {"$gt": 1}}}
+    ])
+    removed = 0
+    async for duplicate in duplicates:
+        doc = await series.find_one({"_id": duplicate["_id"]})
+        await series.delete_many({"_id": duplicate["_id"]})
+        await series.insert_one(doc)
+        removed += duplicate["copies"] - 1
+    return removed
+
+async def migrate(dry_run: bool, batch_size: int, pause: float, min_age_minutes: int, run_dedupe: bool):
+    print("=" * 60)
+    print("Migrating Sessions to a Time-Series Collection")
+    print("=" * 60)
+    print()
+    
+    await connect_to_mongo()
+    db = await get_database()
+    
+    if db is None:
+        print("❌ Failed to connect to MongoDB")
+        return
+    
+    if settings.SESSION_STORAGE == "collection":
+        print("⚠️ SESSION_STORAGE is 'collection': the API still writes new sessions to the old")
+        print("   collection and won't read moved ones. Deploy with SESSION_STORAGE=dual first.")
+        print()
+    
+    # Creates session_series with its time-series options and indexes
+    if not dry_run:
+        await ensure_indexes(db)
+    
+    legacy = db[LEGACY_COLLECTION]
+    series = db[TIMESERIES_COLLECTION]
+    cutoff = datetime.utcnow() - timedelta(minutes=min_age_minutes)
+    settled = {"$or": [{"updated_at": {"$lt": cutoff}}, {"updated_at": {"$exists": False}}]}
+    
+    total = await legacy.count_documents(settled)
+    print(f"Found {total} settled sessions to move (batches of {batch_size})")
+    if dry_run:
+        print("Dry run - nothing written")
+        await close_mongo_connection()
+        return
+    
+    moved = 0
+    last_id = None
+    while True:
+        query = dict(settled)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await legacy.find(query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        
+        ids = [doc["_id"] for doc in batch]
+        for doc in batch:
+            # timeField is required on every measurement
+            doc.setdefault("timestamp", doc.get("created_at") or doc["_id"].generation_time.replace(tzinfo=None))
+        
+        # Clear copies left by an interrupted earlier run, then copy and remove the originals
+        await series.delete_many({"_id": {"$in": ids}})
+        await series.insert_many(batch, ordered=False)
+        await legacy.delete_many({"_id": {"$in": ids}})
+        
+        moved += len(batch)
+        last_id = ids[-1]
+        print(f"   Moved {moved}/{total}")
+        await asyncio.sleep(pause)
+    
+    if run_dedupe:
+        print(f"Removed {await dedupe(db)} duplicate sessions from {TIMESERIES_COLLECTION}")
+    
+    remaining = await legacy.count_documents({})
+    print()
+    print(f"✅ Moved {moved} sessions; {remaining} left in {LEGACY_COLLECTION}")
+    if remaining == 0:
+        print("   The old collection is empty - deploy with SESSION_STORAGE=timeseries")
+    
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move sessions into the time-series collection")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be moved")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.5, help="Seconds to sleep between batches")
+    parser.add_argument("--min-age-minutes", type=int, default=60, help="Skip sessions written more recently")
+    parser.add_argument("--dedupe", action="store_true", help="Collapse duplicate inserts in the time-series collection")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.dry_run, args.batch_size, args.pause, args.min_age_minutes, args.dedupe))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Query plan verification for FitDetect
+Runs explain() on every query shape declared by the repositories against a
+local mongod and fails if any plan contains a COLLSCAN or an in-memory SORT.
+
+Usage:
+    python scripts/verify_query_plans.py [mongodb://localhost:27017]
+
+tests/test_query_plans.py runs the same check under pytest whenever a local
+mongod is reachable.
+
+Uses a throwaway database (dropped afterwards); never point it at production.
+"""
+
+import sys
+import os
+import asyncio
+from datetime import datetime
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.db.indexes import ensure_indexes, registered_queries, blocking_stages
+# Importing the repositories registers their indexes and query shapes
+from app.repositories import sessions, goals, users, exercises, rollups, stats, refresh_tokens  # noqa: F401
+
+PLAN_CHECK_DATABASE = "fitdetect_plan_check"
+
+async def seed(db):
+    """A few documents per collection so the planner has real data to choose over"""
+    now = datetime.utcnow()
+    await db.users.insert_many([
+        {"user_id": f"google_{i}", "name": f"User {i}", "email": f"user{i}@example.com"}
+        for i in range(20)
+    ])
+    await db.sessions.insert_many([
+        {
+            "user_id": f"google_{i % 20}",
+            "exercise_name": "Push-ups",
+            "exercise_type": "pushup" if i % 2 else "squat",
+            "reps": i,
+            "duration": 60.0,
+            "completed": True,
+            "timestamp": now,
+            "created_at": now,
+            "updated_at": now
+        }
+        for i in range(200)
+    ])
+    await ensure_indexes(db)  # Creates the time-series collection before it is seeded
+    await db.session_series.insert_many([
+        {
+            "user_id": f"google_{i % 20}",
+            "exercise_name": "Push-ups",
+            "exercise_type": "pushup",
+            "reps": i,
+            "duration": 60.0,
+            "completed": True,
+            "timestamp": now,
+            "created_at": now,
+            "updated_at": now
+        }
+        for i in range(200)
+    ])
+    await db.goals.insert_many([
+        {
+            "user_id": f"google_{i % 20}",
+            "exercise_type": "pushup" if i % 2 else "squat",
+            "date": datetime(2026, 10, (i // 20) + 1),
+            "target_count": 10,
+            "completed_count": 0,
+            "status": "pending",
+            "created_at": now,
+            "updated_at": now
+        }
+        for i in range(200)
+    ])
+    # Goals still stored with string dates, as before migration 1 (GOAL_DATES=dual)
+    await db.goals.insert_many([
+        {
+            "user_id": f"google_{i % 20}",
+            "exercise_type": "pushup",
+            "date": f"2026-09-{(i // 20) + 1:02d}",
+            "target_count": 10,
+            "completed_count": 0,
+            "status": "pending",
+            "created_at": now,
+            "updated_at": now
+        }
+        for i in range(100)
+    ])
+    await db.daily_rollups.insert_many([
+        {
+            "user_id": f"google_{i % 20}",
+            "date": datetime(2026, 10, (i // 20) + 1),
+            "exercise_type": "pushup",
+            "session_count": 1,
+            "reps": i,
+            "duration": 60.0,
+            "calories": 5.0
+        }
+        for i in range(200)
+    ])
+    await db.exercises.insert_many([
+        {"exercise_id": f"exercise_{i}", "name": f"Exercise {i}", "type": "pushup"}
+        for i in range(5)
+    ])
+
+async def verify_query_plans(uri: str) -> bool:
+    client = AsyncIOMotorClient(uri, serverSelectionTimeoutMS=3000)
+    await client.drop_database(PLAN_CHECK_DATABASE)
+    db = client[PLAN_CHECK_DATABASE]
+    
+    try:
+        await seed(db)
+        await ensure_indexes(db)
+        
+        failures = 0
+        for shape in registered_queries():
+            cursor = db[shape.collection].find(shape.filter, shape.projection)
+            if shape.sort:
+                cursor = cursor.sort(list(shape.sort))
+            plan = await cursor.explain()
+            # Time-series collections explain as a pipeline over the bucket collection
+            planner = plan.get("queryPlanner") or plan["stages"][0]["$cursor"]["queryPlanner"]
+            stages = blocking_stages(planner["winningPlan"])
+            
+            if stages:
+                failures += 1
+                print(f"   ❌ {shape.collection}.{shape.name}: {', '.join(stages)}")
+            else:
+                print(f"   ✅ {shape.collection}.{shape.name}")
+        
+        print()
+        print(f"{len(registered_queries()) - failures} of {len(registered_queries())} query shapes use indexes")
+        return failures == 0
+    finally:
+        await client.drop_database(PLAN_CHECK_DATABASE)
+        client.close()
+
+if __name__ == "__main__":
+    uri = sys.argv[1] if len(sys.argv) > 1 else "mongodb://localhost:27017"
+    print("=" * 60)
+    print("FitDetect - Query Plan Verification")
+    print("=" * 60)
+    ok = asyncio.run(verify_query_plans(uri))
+    sys.exit(0 if ok else 1)
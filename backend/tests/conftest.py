@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Settings that have no default; the tests never talk to Google
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("JOURNAL_PATH", os.path.join(tempfile.gettempdir(), "fitdetect_test_journal.sqlite3"))
+
+# Import app and scripts from the backend directory, as the scripts do
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def mongo():
+    """The app's database handle pointed at an in-memory mongomock client"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from app.core.config import settings
+    from app.db.mongodb import db
+
+    previous = (db.client, db.is_connected)
+    db.client = mongomock_motor.AsyncMongoMockClient()
+    db.is_connected = True
+    yield db.client[settings.DATABASE_NAME]
+    db.client, db.is_connected = previous
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    """A fresh write journal in place of the app's, so journaled writes don't leak between tests"""
+    from app.db import journal as journal_module
+
+    fresh = journal_module.WriteJournal(str(tmp_path / "journal.sqlite3"))
+    monkeypatch.setattr(journal_module, "journal", fresh)
+    yield fresh
+    fresh.close()
+
+TEST_USER = {"id": "google_1", "email": "user@example.com", "name": "Test User"}
+
+@pytest.fixture
+def client(mongo):
+    """API client signed in as TEST_USER (no lifespan: no startup connection or background tasks)"""
+    from fastapi.testclient import TestClient
+
+    from app.core.security import get_current_user
+    from app.main import app
+
+    app.dependency_overrides[get_current_user] = lambda: TEST_USER
+    yield TestClient(app)
+    app.dependency_overrides.clear()
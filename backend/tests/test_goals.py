@@ -0,0 +1,70 @@
+"""
+Month sync: only the difference is written, and If-Match turns a stale sync into 412.
+"""
+
+import asyncio
+from datetime import datetime
+
+from app.repositories import goals
+
+def count_goal_writes(monkeypatch) -> list:
+    """Operations of each bulk write the month sync sends"""
+    writes = []
+    original = goals.write_or_journal
+
+    async def recording(collection_name, operations, ordered=True):
+        writes.append(len(operations))
+        return await original(collection_name, operations, ordered)
+
+    monkeypatch.setattr(goals, "write_or_journal", recording)
+    return writes
+
+def sync(user_id: str, month: str, desired: dict):
+    async def scenario():
+        existing = await goals.month_for_sync(user_id, month)
+        return await goals.apply_month_diff(user_id, month, existing, desired, datetime.utcnow())
+    return asyncio.run(scenario())
+
+def test_month_diff_writes_only_changes(mongo, journal, monkeypatch):
+    writes = count_goal_writes(monkeypatch)
+    month = "2026-09"
+    desired = {("2026-09-01", "squat"): 10, ("2026-09-01", "pushup"): 5, ("2026-09-02", "squat"): 10}
+
+    saved = sync("google_1", month, desired)
+    assert [(goal["date"], goal["exercise_type"]) for goal in saved] == [
+        ("2026-09-01", "pushup"), ("2026-09-01", "squat"), ("2026-09-02", "squat")
+    ]
+    assert writes == [3]
+
+    # Unchanged: no write at all
+    sync("google_1", month, desired)
+    assert writes == [3]
+
+    # One changed target and one removed goal: one bulk write of two operations
+    del desired[("2026-09-01", "pushup")]
+    desired[("2026-09-02", "squat")] = 20
+    saved = sync("google_1", month, desired)
+    assert writes == [3, 2]
+    assert {(goal["date"], goal["exercise_type"]): goal["target_count"] for goal in saved} == {
+        ("2026-09-01", "squat"): 10, ("2026-09-02", "squat"): 20
+    }
+    assert asyncio.run(mongo.goals.count_documents({"user_id": "google_1"})) == 2
+
+def test_if_match_rejects_a_stale_sync(client, journal):
+    body = {"month": "2026-08", "goals": [{"exercise_type": "squat", "target_count": 10, "date": "2026-08-03"}]}
+    first = client.post("/api/goals/bulk", json=body)
+    assert first.status_code == 201
+    version = first.headers["ETag"]
+
+    listed = client.get("/api/goals", params={"start_date": "2026-08-01", "end_date": "2026-08-31"})
+    assert listed.headers["ETag"] == version
+
+    # Another device changes the month
+    body["goals"][0]["target_count"] = 15
+    assert client.post("/api/goals/bulk", json=body, headers={"If-Match": version}).status_code == 201
+
+    # This device still holds the old version
+    body["goals"][0]["target_count"] = 20
+    stale = client.post("/api/goals/bulk", json=body, headers={"If-Match": version})
+    assert stale.status_code == 412
+    assert client.get("/api/goals", params={"start_date": "2026-08-01", "end_date": "2026-08-31"}).json()[0]["target_count"] == 15
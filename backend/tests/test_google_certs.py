@@ -0,0 +1,166 @@
+"""
+GoogleCertCache against a local stand-in for Google's certificate endpoint.
+"""
+
+import asyncio
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip("cryptography")
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt as google_jwt
+
+from app.core.config import settings
+from app.core.google_certs import GoogleCertCache, run_cert_refresher
+
+AUDIENCE = "test-client-id"
+
+def make_key(key_id: str):
+    """RSA signer for key_id and the PEM certificate Google would publish for it"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=key_id)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+def make_token(signer) -> bytes:
+    now = int(time.time())
+    return google_jwt.encode(signer, {
+        "iss": "https://accounts.google.com",
+        "aud": AUDIENCE,
+        "sub": "1234",
+        "email": "user@example.com",
+        "iat": now,
+        "exp": now + 600,
+    })
+
+class CertServer:
+    """Serves certs as JSON with a Cache-Control max-age and records when it was asked"""
+
+    def __init__(self, certs: dict, max_age: int):
+        self.certs = certs
+        self.max_age = max_age
+        self.requests = []  # time.monotonic() of each fetch
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(time.monotonic())
+                body = json.dumps(server.certs).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", f"public, max-age={server.max_age}, must-revalidate")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/oauth2/v1/certs"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def keys():
+    return {"key-1": make_key("key-1"), "key-2": make_key("key-2")}
+
+@pytest.fixture
+def cert_server(keys):
+    server = CertServer({"key-1": keys["key-1"][1]}, max_age=120)
+    yield server
+    server.close()
+
+def test_max_age_is_honoured(cert_server):
+    async def scenario():
+        cache = GoogleCertCache(cert_server.url)
+        await cache.refresh()
+        assert cache.fresh()
+        assert cache.expires_at - cache.fetched_at == 120
+        await cache.get_certs()
+        assert len(cert_server.requests) == 1
+
+    asyncio.run(scenario())
+
+def test_background_refresh_happens_before_expiry(cert_server):
+    cert_server.max_age = 3
+
+    async def scenario():
+        cache = GoogleCertCache(cert_server.url)
+        refresher = asyncio.create_task(run_cert_refresher(cache))
+        await asyncio.sleep(2.5)
+        refresher.cancel()
+
+    asyncio.run(scenario())
+    # Refetched once, half way through the max-age rather than on a tight loop
+    assert len(cert_server.requests) == 2
+    assert cert_server.requests[1] - cert_server.requests[0] < cert_server.max_age
+
+def test_refresh_delay_is_bounded_by_max_age(cert_server):
+    assert cert_server.max_age < settings.GOOGLE_CERTS_REFRESH_MARGIN_SECONDS
+
+    async def scenario():
+        cache = GoogleCertCache(cert_server.url)
+        await cache.refresh()
+        return cache.refresh_delay()
+
+    assert asyncio.run(scenario()) == pytest.approx(60, abs=1)
+
+def test_verify_makes_no_outbound_call_while_fresh(cert_server, keys):
+    token = make_token(keys["key-1"][0])
+
+    async def scenario():
+        cache = GoogleCertCache(cert_server.url)
+        for _ in range(3):
+            claims = await cache.verify(token, AUDIENCE)
+            assert claims["email"] == "user@example.com"
+
+    asyncio.run(scenario())
+    assert len(cert_server.requests) == 1
+
+def test_unknown_key_refetch_is_throttled(cert_server, keys):
+    token = make_token(keys["key-2"][0])
+
+    async def scenario():
+        cache = GoogleCertCache(cert_server.url)
+        await cache.refresh()
+
+        # Just fetched: an unknown key id is rejected without asking again
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                await cache.verify(token, AUDIENCE)
+        assert len(cert_server.requests) == 1
+
+        # Once the retry interval has passed, one refetch picks up the newly published key
+        cert_server.certs["key-2"] = keys["key-2"][1]
+        cache.fetched_at -= settings.GOOGLE_CERTS_RETRY_SECONDS
+        assert (await cache.verify(token, AUDIENCE))["sub"] == "1234"
+        assert (await cache.verify(token, AUDIENCE))["sub"] == "1234"
+        assert len(cert_server.requests) == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+"""
+WriteJournal replay: idempotent after a crash, dead-lettering, one flusher at a time.
+"""
+
+import asyncio
+
+from bson import ObjectId, json_util
+
+from app.db.journal import WriteJournal, journal_insert, journal_update
+
+ROLLUP_KEY = {"user_id": "u1", "date": "2026-10-19", "exercise_type": "squat"}
+
+def progress_pipeline(reps: int) -> list:
+    return [{"$set": {"completed_count": {"$add": [{"$ifNull": ["$completed_count", 0]}, reps]}}}]
+
+def requeue(journal: WriteJournal, rows):
+    """Put rows back as if the process died between bulk_write and removing them"""
+    conn = journal._connection()
+    conn.executemany(
+        "INSERT INTO pending_writes (id, collection, operation) VALUES (?, ?, ?)",
+        [(row_id, collection, json_util.dumps(entry)) for row_id, collection, entry in rows]
+    )
+    conn.commit()
+
+def test_replay_after_crash_applies_each_entry_once(mongo, tmp_path):
+    journal = WriteJournal(str(tmp_path / "journal.sqlite3"))
+    session_id = ObjectId()
+
+    async def scenario():
+        await mongo.daily_rollups.create_index(list((field, 1) for field in ROLLUP_KEY), unique=True)
+        await mongo.goals.insert_one({"user_id": "u1", "date": "2026-10-19"})
+        await journal.append("daily_rollups", [journal_update(ROLLUP_KEY, {"$inc": {"reps": 5}}, upsert=True)])
+        await journal.append("goals", [journal_update({"user_id": "u1"}, progress_pipeline(3))])
+        await journal.append("session_series", [journal_insert({"_id": session_id, "user_id": "u1"})])
+        rows = journal._read_batch(10)
+
+        assert await journal.flush(10) == 3
+        requeue(journal, rows)
+        await journal.flush(10)
+
+        assert await journal.pending_count() == 0
+        assert (await mongo.daily_rollups.find_one(ROLLUP_KEY))["reps"] == 5
+        assert (await mongo.goals.find_one({"user_id": "u1"}))["completed_count"] == 3
+        assert await mongo.session_series.count_documents({"_id": session_id}) == 1
+
+    asyncio.run(scenario())
+    journal.close()
+
+def test_failing_entry_is_dead_lettered_and_the_rest_replayed(mongo, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.JOURNAL_MAX_ATTEMPTS", 2)
+    journal = WriteJournal(str(tmp_path / "journal.sqlite3"))
+
+    async def scenario():
+        # mongomock raises a TypeError where MongoDB would reject the write
+        await journal.append("user_stats", [journal_update({"_id": "u1"}, {"$inc": {"reps": "x"}}, upsert=True)])
+        await journal.append("user_stats", [journal_update({"_id": "u2"}, {"$inc": {"reps": 1}}, upsert=True)])
+
+        replayed = None
+        for _ in range(2):
+            try:
+                replayed = await journal.flush(10)
+            except TypeError:
+                pass
+        assert replayed == 1
+        assert await journal.pending_count() == 0
+        assert await journal.dead_letter_count() == 1
+        assert (await mongo.user_stats.find_one({"_id": "u2"}))["reps"] == 1
+
+    asyncio.run(scenario())
+    journal.close()
+
+def test_only_the_lease_holder_replays(mongo, tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    worker, other = WriteJournal(path), WriteJournal(path)
+
+    async def scenario():
+        await worker.append("user_stats", [journal_update({"_id": "u1"}, {"$inc": {"reps": 1}}, upsert=True)])
+        assert other._acquire_lease()
+        assert await worker.flush(10) == 0
+        assert await worker.pending_count() == 1
+
+        other._release_lease()
+        assert await worker.flush(10) == 1
+
+    asyncio.run(scenario())
+    worker.close()
+    other.close()
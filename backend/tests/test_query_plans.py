@@ -0,0 +1,37 @@
+"""
+Every query shape the repositories declare must be served by an index.
+Needs a local mongod (PLAN_CHECK_MONGODB_URL, default localhost); skipped without one.
+"""
+
+import asyncio
+import os
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from scripts.verify_query_plans import verify_query_plans
+
+MONGODB_URL = os.environ.get("PLAN_CHECK_MONGODB_URL", "mongodb://localhost:27017")
+
+def mongod_available() -> bool:
+    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        client.close()
+
+@pytest.mark.skipif(not mongod_available(), reason=f"no mongod at {MONGODB_URL}")
+def test_declared_queries_use_indexes():
+    assert asyncio.run(verify_query_plans(MONGODB_URL))
+
+def test_goal_date_shapes_cover_both_modes():
+    from app.db.indexes import registered_queries
+    from app.repositories import goals  # noqa: F401
+
+    names = {shape.name for shape in registered_queries() if shape.collection == "goals"}
+    for query in ("goal_by_key", "find_goals_range", "find_goals_range_by_type", "expire_goals"):
+        assert {f"{query}_native", f"{query}_dual"} <= names
@@ -0,0 +1,72 @@
+"""
+Token bucket rate limiting: refill over time, the capacity cap, and 429 with Retry-After.
+"""
+
+import asyncio
+
+from app.core import rate_limit
+from app.core.rate_limit import MemoryRateLimitBackend
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+def test_bucket_refills_over_time(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    bucket = MemoryRateLimitBackend(capacity=3, refill_per_second=2, max_keys=10)
+
+    async def scenario():
+        assert [await bucket.acquire("u1", 1) for _ in range(3)] == [0, 0, 0]
+        # Empty: one token is half a second away
+        assert await bucket.acquire("u1", 1) == 0.5
+        clock.now += 0.5
+        assert await bucket.acquire("u1", 1) == 0
+        # Other users have their own bucket
+        assert await bucket.acquire("u2", 3) == 0
+
+    asyncio.run(scenario())
+
+def test_refill_stops_at_capacity(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    bucket = MemoryRateLimitBackend(capacity=3, refill_per_second=2, max_keys=10)
+
+    async def scenario():
+        assert await bucket.acquire("u1", 3) == 0
+        clock.now += 3600
+        assert await bucket.acquire("u1", 3) == 0
+        assert await bucket.acquire("u1", 1) == 0.5
+
+    asyncio.run(scenario())
+
+def test_least_recently_active_users_are_dropped(monkeypatch):
+    monkeypatch.setattr(rate_limit, "time", FakeClock())
+    bucket = MemoryRateLimitBackend(capacity=1, refill_per_second=1, max_keys=2)
+
+    async def scenario():
+        for user in ("u1", "u2", "u3"):
+            assert await bucket.acquire(user, 1) == 0
+        # u1 was dropped and starts over with a full bucket; u3 is still empty
+        assert await bucket.acquire("u1", 1) == 0
+        assert await bucket.acquire("u3", 1) == 1
+
+    asyncio.run(scenario())
+
+def test_write_route_returns_429_with_retry_after(client, journal, monkeypatch):
+    monkeypatch.setattr(rate_limit, "limiter", MemoryRateLimitBackend(capacity=2, refill_per_second=0.1, max_keys=10))
+    throttled = rate_limit.throttled_requests
+
+    statuses = [
+        client.post("/api/goals", json={"exercise_type": "squat", "target_count": 5, "date": f"2026-07-0{day}"}).status_code
+        for day in (1, 2, 3)
+    ]
+    assert statuses == [201, 201, 429]
+
+    response = client.post("/api/goals", json={"exercise_type": "squat", "target_count": 5, "date": "2026-07-04"})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 10
+    assert rate_limit.throttled_requests == throttled + 2
@@ -0,0 +1,35 @@
+"""
+Refresh token rotation: concurrent refreshes share a successor, late reuse revokes the family.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from app.repositories import refresh_tokens
+
+def test_reuse_within_grace_returns_the_same_successor(mongo):
+    async def scenario():
+        token = await refresh_tokens.issue("google_1", "user@example.com")
+        first = await refresh_tokens.rotate(token)
+        second = await refresh_tokens.rotate(token)
+        assert first is not None and second is not None
+        assert first[1] == second[1]
+        assert second[0]["user_id"] == "google_1"
+        assert await mongo.refresh_tokens.count_documents({}) == 2
+
+        # The shared successor rotates normally
+        assert await refresh_tokens.rotate(first[1]) is not None
+
+    asyncio.run(scenario())
+
+def test_reuse_after_grace_revokes_the_family(mongo):
+    async def scenario():
+        token = await refresh_tokens.issue("google_1", "user@example.com")
+        successor = (await refresh_tokens.rotate(token))[1]
+        await mongo.refresh_tokens.update_many({"used": True}, {"$set": {"used_at": datetime.utcnow() - timedelta(minutes=1)}})
+
+        assert await refresh_tokens.rotate(token) is None
+        assert await mongo.refresh_tokens.count_documents({}) == 0
+        assert await refresh_tokens.rotate(successor) is None
+
+    asyncio.run(scenario())
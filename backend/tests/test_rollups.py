@@ -0,0 +1,102 @@
+"""
+Daily rollups: session deltas keep each day's totals exact, and streaks are read from them.
+"""
+
+import asyncio
+from datetime import date, datetime
+
+from bson import ObjectId
+
+from app.db.write_buffer import apply_session_deltas
+from app.repositories import rollups
+
+TODAY = date(2026, 10, 19)
+
+def session_on(day: str, exercise_type: str = "squat", reps: int = 10) -> dict:
+    return {
+        "_id": ObjectId(),
+        "user_id": "google_1",
+        "exercise_type": exercise_type,
+        "reps": reps,
+        "duration": 60,
+        "calories_burned": 5.0,
+        "created_at": datetime.fromisoformat(f"{day}T12:00:00"),
+    }
+
+def removal(session: dict) -> tuple:
+    """Delta taking back everything a session contributed"""
+    return session, {metric: -value for metric, value in rollups.session_metrics(session).items()}
+
+async def record(*sessions):
+    """Count new sessions, as session creation and bulk ingest do"""
+    await apply_session_deltas([(session, rollups.session_metrics(session)) for session in sessions])
+
+def test_deltas_keep_day_totals_exact(mongo, journal):
+    first, second = session_on("2026-10-19"), session_on("2026-10-19", reps=4)
+
+    async def scenario():
+        await record(first, second)
+        # An edit adds only the difference
+        edited = {**first, "reps": 15}
+        await apply_session_deltas([(edited, rollups.metrics_delta(rollups.session_metrics(edited), rollups.session_metrics(first)))])
+        # A deletion takes the session's contribution back
+        await apply_session_deltas([removal(second)])
+
+        rollup = await mongo.daily_rollups.find_one({"user_id": "google_1", "date": "2026-10-19", "exercise_type": "squat"})
+        assert (rollup["session_count"], rollup["reps"], rollup["duration"]) == (1, 15, 60)
+        stats = await mongo.user_stats.find_one({"_id": "google_1"})
+        assert (stats["session_count"], stats["reps"]) == (1, 15)
+
+        # Days whose sessions were all deleted are not active
+        await apply_session_deltas([removal(edited)])
+        assert await rollups.activity_days("google_1", "2026-10-01", "2026-10-31") == []
+
+    asyncio.run(scenario())
+
+def test_activity_days_newest_first_per_exercise(mongo, journal):
+    async def scenario():
+        await record(
+            session_on("2026-10-17"),
+            session_on("2026-10-19"),
+            session_on("2026-10-19", exercise_type="pushup", reps=3),
+        )
+        days = await rollups.activity_days("google_1", "2026-10-01", "2026-10-31")
+        assert days[0].date == "2026-10-19"
+        assert sorted((day.date, day.exercise_type, day.reps) for day in days) == [
+            ("2026-10-17", "squat", 10), ("2026-10-19", "pushup", 3), ("2026-10-19", "squat", 10)
+        ]
+
+    asyncio.run(scenario())
+
+def test_streak_counts_consecutive_days_ending_today(mongo, journal):
+    async def scenario():
+        await record(
+            session_on("2026-10-15"),
+            session_on("2026-10-17"),
+            session_on("2026-10-18"),
+            session_on("2026-10-19"),
+            session_on("2026-10-19", exercise_type="pushup"),
+        )
+        assert await rollups.current_streak("google_1", TODAY) == 3
+
+    asyncio.run(scenario())
+
+def test_streak_still_counts_until_today_has_a_session(mongo, journal):
+    async def scenario():
+        await record(session_on("2026-10-17"), session_on("2026-10-18"))
+        assert await rollups.current_streak("google_1", TODAY) == 2
+        # A missed day ends it
+        assert await rollups.current_streak("google_1", date(2026, 10, 20)) == 0
+
+    asyncio.run(scenario())
+
+def test_streak_ignores_days_whose_sessions_were_deleted(mongo, journal):
+    removed = session_on("2026-10-18")
+
+    async def scenario():
+        await record(session_on("2026-10-17"), removed, session_on("2026-10-19"))
+        assert await rollups.current_streak("google_1", TODAY) == 3
+        await apply_session_deltas([removal(removed)])
+        assert await rollups.current_streak("google_1", TODAY) == 1
+
+    asyncio.run(scenario())
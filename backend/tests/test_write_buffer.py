@@ -0,0 +1,125 @@
+"""
+SessionWriteBuffer: updates coalesce into one write per window, and flush drains everything pending.
+"""
+
+import asyncio
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.db import write_buffer
+from app.db.mongodb import db
+from app.db.write_buffer import SessionWriteBuffer
+from app.repositories import rollups
+
+def new_session(reps: int = 0) -> dict:
+    return {
+        "_id": ObjectId(),
+        "user_id": "google_1",
+        "exercise_type": "squat",
+        "reps": reps,
+        "duration": 0,
+        "calories_burned": 0,
+        "created_at": datetime(2026, 10, 19, 8),
+    }
+
+def count_writes(monkeypatch) -> list:
+    """Collections written (or journaled) by the buffer, one item per bulk write"""
+    writes = []
+    original = write_buffer.write_or_journal
+
+    async def recording(collection_name, operations, ordered=True):
+        writes.append(collection_name)
+        return await original(collection_name, operations, ordered)
+
+    monkeypatch.setattr(write_buffer, "write_or_journal", recording)
+    return writes
+
+def test_updates_within_a_window_are_written_once(mongo, journal, monkeypatch):
+    writes = count_writes(monkeypatch)
+    session = new_session()
+
+    async def scenario():
+        await mongo.sessions.insert_one(session)
+        buffer = SessionWriteBuffer(window_seconds=0.05, max_entries=10, idle_seconds=60)
+        buffer.seed(session, "sessions")
+        session_id = str(session["_id"])
+
+        await buffer.update(session_id, {"reps": 5})
+        state = await buffer.update(session_id, {"reps": 8, "duration": 30})
+        assert state["reps"] == 8
+        assert (await mongo.sessions.find_one({"_id": session["_id"]}))["reps"] == 0
+
+        await asyncio.sleep(0.2)
+        stored = await mongo.sessions.find_one({"_id": session["_id"]})
+        assert (stored["reps"], stored["duration"]) == (8, 30)
+        rollup = await mongo.daily_rollups.find_one({"user_id": "google_1", "date": "2026-10-19"})
+        assert (rollup["reps"], rollup["duration"]) == (8, 30)
+        assert (await mongo.user_stats.find_one({"_id": "google_1"}))["reps"] == 8
+
+    asyncio.run(scenario())
+    assert writes == ["sessions", "daily_rollups", "user_stats"]
+
+def test_flush_drains_every_pending_session(mongo, journal, monkeypatch):
+    writes = count_writes(monkeypatch)
+    sessions = [new_session(), new_session()]
+
+    async def scenario():
+        await mongo.sessions.insert_many(sessions)
+        # A window long enough that only the explicit flush (as at shutdown) writes
+        buffer = SessionWriteBuffer(window_seconds=60, max_entries=10, idle_seconds=60)
+        for reps, session in enumerate(sessions, start=3):
+            buffer.seed(session, "sessions")
+            await buffer.update(str(session["_id"]), {"reps": reps})
+
+        await buffer.flush()
+        assert [doc["reps"] async for doc in mongo.sessions.find().sort("reps", 1)] == [3, 4]
+        assert (await mongo.user_stats.find_one({"_id": "google_1"}))["reps"] == 7
+
+        # Nothing left: a second flush writes nothing
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    assert writes == ["sessions", "daily_rollups", "user_stats"]
+
+def test_offline_flush_is_journaled(mongo, journal):
+    session = new_session()
+
+    async def scenario():
+        buffer = SessionWriteBuffer(window_seconds=60, max_entries=10, idle_seconds=60)
+        buffer.seed(session, "sessions", accounted=rollups.session_metrics(None))
+        await buffer.update(str(session["_id"]), {"reps": 4})
+
+        db.is_connected = False
+        await buffer.flush()
+        # The session update, its day's rollup and the user's stats
+        assert await journal.pending_count() == 3
+        assert await mongo.sessions.count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+def test_failed_write_keeps_changes_for_the_next_flush(mongo, journal, monkeypatch):
+    session = new_session()
+    original = write_buffer.write_or_journal
+
+    async def failing(collection_name, operations, ordered=True):
+        raise RuntimeError("write failed")
+
+    async def scenario():
+        await mongo.sessions.insert_one(session)
+        buffer = SessionWriteBuffer(window_seconds=60, max_entries=10, idle_seconds=60)
+        buffer.seed(session, "sessions")
+        await buffer.update(str(session["_id"]), {"reps": 6})
+
+        monkeypatch.setattr(write_buffer, "write_or_journal", failing)
+        try:
+            await buffer.flush()
+        except RuntimeError:
+            pass
+        monkeypatch.setattr(write_buffer, "write_or_journal", original)
+
+        await buffer.flush()
+        assert (await mongo.sessions.find_one({"_id": session["_id"]}))["reps"] == 6
+        assert (await mongo.user_stats.find_one({"_id": "google_1"}))["reps"] == 6
+
+    asyncio.run(scenario())
@@ -1,6 +1,40 @@
 import NextAuth from 'next-auth'
 import GoogleProvider from 'next-auth/providers/google'
 
+// Renew the backend access token this long before it expires
+const REFRESH_MARGIN_MS = 60 * 1000
+
+// ✅ OPTIMIZATION: Renew the backend token with the rotating refresh token
+// instead of repeating the Google login every half hour
+async function refreshBackendToken(token: any) {
+  const API_URL = process.env.NEXT_PUBLIC_API_URL
+  try {
+    const response = await fetch(`${API_URL}/api/auth/refresh`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: token.backendRefreshToken }),
+    })
+    
+    if (!response.ok) {
+      // Expired or revoked: the user has to sign in again
+      console.error('Backend token refresh failed:', response.status)
+      return { ...token, backendToken: undefined, backendRefreshToken: undefined, accessToken: undefined }
+    }
+    
+    const data = await response.json()
+    return {
+      ...token,
+      backendToken: data.access_token,
+      backendRefreshToken: data.refresh_token,
+      backendTokenExpires: Date.now() + data.expires_in * 1000,
+    }
+  } catch (error) {
+    // Network error: keep the current tokens and retry on the next request
+    console.error('Backend token refresh failed (will retry):', error)
+    return token
+  }
+}
+
 const handler = NextAuth({
   providers: [
     GoogleProvider({
@@ -51,6 +85,8 @@ const handler = NextAuth({
             const data = await response.json()
             console.log('Backend token fetched successfully')
             token.backendToken = data.access_token
+            token.backendRefreshToken = data.refresh_token
+            token.backendTokenExpires = Date.now() + data.expires_in * 1000
             token.userId = data.user?.user_id
           }
         } catch (error) {
@@ -59,6 +95,14 @@ const handler = NextAuth({
         }
       }
       
+      if (
+        token.backendToken &&
+        token.backendRefreshToken &&
+        Date.now() > (token.backendTokenExpires as number) - REFRESH_MARGIN_MS
+      ) {
+        token = await refreshBackendToken(token)
+      }
+      
       // Use backend token if available, otherwise fallback to Google token
       if (token.backendToken) {
         token.accessToken = token.backendToken
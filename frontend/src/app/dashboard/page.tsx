@@ -44,12 +44,15 @@ export default function Dashboard() {
   const [showInitialGoalSetup, setShowInitialGoalSetup] = useState(false)
   const [showGoalCalendar, setShowGoalCalendar] = useState(false)
   const [goals, setGoals] = useState<Goal[]>([])
+  // Version token (ETag) of the current month's goals, sent as If-Match when saving
+  const [goalsVersion, setGoalsVersion] = useState<string | null>(null)
   const [todayGoals, setTodayGoals] = useState<Goal[]>([])
   const [goalStats, setGoalStats] = useState({
     total_goals: 0,
     completed_goals: 0,
     pending_goals: 0,
     in_progress_goals: 0,
+    missed_goals: 0,
     completion_rate: 0
   })
   // Avatar state
@@ -66,39 +69,49 @@ export default function Dashboard() {
   useEffect(() => {
     if (session) {
       fetchExercises()
-      fetchRecentSessions()
-      fetchStats()
+      fetchDashboard()
       fetchGoals()
-      fetchTodayGoals()
-      fetchGoalStats()
-      checkInitialGoalSetup()
-      checkAvatarStatus()
     }
   }, [session])
 
-  const checkAvatarStatus = async () => {
+  // ✅ OPTIMIZATION: Profile, stats, history, today's goals and goal summary in one request
+  const fetchDashboard = async () => {
     try {
       const response = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL}/api/users/me/avatar`,
+        `${process.env.NEXT_PUBLIC_API_URL}/api/dashboard`,
         {
           headers: {
             Authorization: `Bearer ${(session as any)?.accessToken}`,
           },
         }
       )
-
-      if (response.ok) {
-        const data = await response.json()
-        setUserAvatar(data.avatar)
-        setAvatarSelected(data.avatar_selected)
-        
+      if (!response.ok) return
+      const data = await response.json()
+      // A section that failed on the server is null: keep what is shown for it
+      if (data.errors?.length) {
+        console.warn('Dashboard sections unavailable:', data.errors)
+      }
+      
+      if (data.profile) {
+        setUserAvatar(data.profile.avatar)
+        setAvatarSelected(data.profile.avatar_selected)
         // Show avatar modal if user hasn't selected one yet
-        if (!data.avatar_selected) {
+        if (!data.profile.avatar_selected) {
           setShowAvatarModal(true)
         }
       }
+      if (data.stats) setStats(data.stats)
+      if (data.recent_sessions) setRecentSessions(data.recent_sessions)
+      if (data.today_goals) setTodayGoals(data.today_goals)
+      if (data.goal_stats) {
+        setGoalStats(data.goal_stats)
+        // Show initial setup if user has never set any goals
+        if (data.goal_stats.total_goals_this_month === 0) {
+          setShowInitialGoalSetup(true)
+        }
+      }
     } catch (error) {
-      console.error('Failed to check avatar status:', error)
+      console.error('Error fetching dashboard:', error)
     }
   }
 
@@ -108,37 +121,15 @@ export default function Dashboard() {
     setShowAvatarModal(false)
   }
 
-  const checkInitialGoalSetup = async () => {
-    try {
-      const response = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL}/api/goals/stats/summary`,
-        {
-          headers: {
-            Authorization: `Bearer ${(session as any)?.accessToken}`,
-          },
-        }
-      )
-      if (response.ok) {
-        const data = await response.json()
-        // Show initial setup if user has never set any goals
-        if (data.total_goals_this_month === 0) {
-          setShowInitialGoalSetup(true)
-        }
-      }
-    } catch (error) {
-      console.error('Error checking goal setup:', error)
-    }
-  }
-
   const fetchGoals = async () => {
     try {
-      // Get current month's goals
+      // Get current month's goals (local calendar dates, so the range is exactly the month)
       const today = new Date()
-      const startDate = new Date(today.getFullYear(), today.getMonth(), 1)
-      const endDate = new Date(today.getFullYear(), today.getMonth() + 1, 0)
+      const month = `${today.getFullYear()}-${String(today.getMonth() + 1).padStart(2, '0')}`
+      const lastDay = new Date(today.getFullYear(), today.getMonth() + 1, 0).getDate()
       
       const response = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL}/api/goals?start_date=${startDate.toISOString().split('T')[0]}&end_date=${endDate.toISOString().split('T')[0]}`,
+        `${process.env.NEXT_PUBLIC_API_URL}/api/goals?start_date=${month}-01&end_date=${month}-${String(lastDay).padStart(2, '0')}`,
         {
           headers: {
             Authorization: `Bearer ${(session as any)?.accessToken}`,
@@ -148,6 +139,7 @@ export default function Dashboard() {
       if (response.ok) {
         const data = await response.json()
         setGoals(data)
+        setGoalsVersion(response.headers.get('ETag'))
       }
     } catch (error) {
       console.error('Error fetching goals:', error)
@@ -224,6 +216,11 @@ export default function Dashboard() {
     }
   }
 
+  const currentMonth = () => {
+    const now = new Date()
+    return `${now.getFullYear()}-${String(now.getMonth() + 1).padStart(2, '0')}`
+  }
+
   const handleSaveGoals = async (updatedGoals: any[], month: string) => {
     try {
       console.log('Saving goals:', updatedGoals)
@@ -236,6 +233,8 @@ export default function Dashboard() {
           headers: {
             'Content-Type': 'application/json',
             Authorization: `Bearer ${(session as any)?.accessToken}`,
+            // Only guard the month the version was read for
+            ...(goalsVersion && month === currentMonth() ? { 'If-Match': goalsVersion } : {}),
           },
           body: JSON.stringify({ goals: updatedGoals, month }),
         }
@@ -248,6 +247,9 @@ export default function Dashboard() {
         // ✅ OPTIMIZATION: Update local state instead of refetching everything
         // The backend already returns the saved goals
         setGoals(data)
+        if (month === currentMonth()) {
+          setGoalsVersion(response.headers.get('ETag'))
+        }
         
         // ✅ OPTIMIZATION: Fetch stats and today's goals in parallel (non-blocking)
         Promise.all([
@@ -260,6 +262,10 @@ export default function Dashboard() {
         if (data.errors && data.errors.length > 0) {
           console.warn('Some goals had errors:', data.errors)
         }
+      } else if (response.status === 412) {
+        // Changed on another device since it was loaded: show the latest instead of overwriting
+        await fetchGoals()
+        throw new Error('Your goals were changed elsewhere. The latest version has been loaded, please review and save again.')
       } else {
         const errorMsg = data.detail || 'Failed to save goals'
         throw new Error(errorMsg)
@@ -282,44 +288,6 @@ export default function Dashboard() {
     }
   }
 
-  const fetchRecentSessions = async () => {
-    try {
-      const response = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL}/api/users/history?limit=5`,
-        {
-          headers: {
-            Authorization: `Bearer ${(session as any)?.accessToken}`,
-          },
-        }
-      )
-      if (response.ok) {
-        const data = await response.json()
-        setRecentSessions(data.sessions || [])
-      }
-    } catch (error) {
-      console.error('Error fetching sessions:', error)
-    }
-  }
-
-  const fetchStats = async () => {
-    try {
-      const response = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL}/api/users/stats`,
-        {
-          headers: {
-            Authorization: `Bearer ${(session as any)?.accessToken}`,
-          },
-        }
-      )
-      if (response.ok) {
-        const data = await response.json()
-        setStats(data)
-      }
-    } catch (error) {
-      console.error('Error fetching stats:', error)
-    }
-  }
-
   if (status === 'loading') {
     return (
       <div className="min-h-screen flex items-center justify-center">
@@ -111,40 +111,10 @@ export default function ExercisePage() {
   const stopExercise = async () => {
     setIsStarted(false)
     
-    // Update goal progress if there's a goal for today
-    if (todayGoal && sessionId) {
-      try {
-        const newCompletedCount = todayGoal.completed_count + repCount
-        const response = await fetch(
-          `${process.env.NEXT_PUBLIC_API_URL}/api/goals/${todayGoal.id}`,
-          {
-            method: 'PUT',
-            headers: {
-              'Content-Type': 'application/json',
-              Authorization: `Bearer ${(session as any)?.accessToken}`,
-            },
-            body: JSON.stringify({
-              completed_count: newCompletedCount,
-            }),
-          }
-        )
-        
-        if (response.ok) {
-          // Check if goal is achieved
-          if (newCompletedCount >= todayGoal.target_count) {
-            setShowGoalAchievement(true)
-          }
-          // Refresh goal data
-          await fetchTodayGoal()
-        }
-      } catch (error) {
-        console.error('Error updating goal:', error)
-      }
-    }
-    
     if (sessionId) {
       try {
-        // Update session with final data
+        // Update session with final data; the backend also advances today's goal
+        // for this exercise and returns it, so no separate goal update or refetch
         const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/sessions/${sessionId}`, {
           method: 'PUT',
           headers: {
@@ -164,6 +134,15 @@ export default function ExercisePage() {
           if (updatedSession.calories_burned) {
             setCalories(updatedSession.calories_burned)
           }
+          
+          const updatedGoal = updatedSession.goal
+          if (updatedGoal) {
+            // Check if goal is achieved
+            if (updatedGoal.completed_count >= updatedGoal.target_count) {
+              setShowGoalAchievement(true)
+            }
+            setTodayGoal(updatedGoal)
+          }
         }
       } catch (error) {
         console.error('Error updating session:', error)